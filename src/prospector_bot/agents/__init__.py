@@ -7,6 +7,9 @@ from typing import Callable
 from .craigslist import scrape as scrape_craigslist
 from .ebay import scrape as scrape_ebay
 from .facebook import scrape as scrape_facebook
+from .facebook import scrape_batch as scrape_facebook_batch
+from .mercado_livre import scrape as scrape_mercado_livre
+from .olx import scrape as scrape_olx
 from .rss import scrape as scrape_rss
 
 
@@ -15,13 +18,18 @@ class Agent:
     name: str
     handler: Callable
     requires_browser: bool = False
+    # Optional ``(pages, [(client, seen_ids), ...]) -> [offers, ...]`` handler that
+    # scrapes several clients at once on separate browser tabs.
+    batch_handler: Callable | None = None
 
 
 AGENTS = [
     Agent("craigslist", scrape_craigslist, False),
     Agent("ebay", scrape_ebay, False),
     Agent("rss", scrape_rss, False),
-    Agent("facebook", scrape_facebook, True),
+    Agent("olx", scrape_olx, False),
+    Agent("mercado_livre", scrape_mercado_livre, False),
+    Agent("facebook", scrape_facebook, True, scrape_facebook_batch),
 ]
 
 __all__ = ["AGENTS", "Agent"]
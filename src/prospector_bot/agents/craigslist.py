@@ -59,6 +59,8 @@ def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
 
     print(f"       [CL] Reading RSS feed...")
 
+    # Whole-feed read (shared and cached): with the cap below, stopping at the
+    # first seen item would lose matches left past the cap on a busy poll.
     items = fetch_rss_items(url)
     results = []
 
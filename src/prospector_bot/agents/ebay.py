@@ -27,9 +27,11 @@ from __future__ import annotations
 import json
 import os
 import urllib.parse
-import urllib.request
 
 from ..utils import parse_price
+from ..utils.cache import cached
+from ..utils.coalesce import coalesced
+from ..utils.http_client import http_get
 
 FINDING_ENDPOINT = "https://svcs.ebay.com/services/search/FindingService/v1"
 
@@ -165,13 +167,19 @@ def _make_filter(name: str, value: float, currency: str) -> dict:
 
 
 def _fetch_json(url: str) -> dict | None:
-    headers = {"User-Agent": "ProspectorBot/1.0"}
-    request = urllib.request.Request(url, headers=headers)
+    # Identical queries (same keywords, price range and app id) share one call per
+    # cycle, and reuse a recent answer while it is within the eBay cache TTL.
+    return coalesced(("ebay", url), lambda: cached("ebay", url, lambda: _download_json(url)))
+
+
+def _download_json(url: str) -> dict | None:
     try:
-        with urllib.request.urlopen(request, timeout=20) as response:
-            raw = response.read()
+        response = http_get(url, headers={"Accept": "application/json"})
     except Exception:
         return None
+    if not response.ok:
+        return None
+    raw = response.body
     try:
         return json.loads(raw.decode("utf-8"))
     except Exception:
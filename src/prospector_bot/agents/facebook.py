@@ -16,108 +16,347 @@ needed to bypass Facebook's aggressive anti-scraping blocks for this MVP.
 Architecture: DOM-based scraping (Headless Browser) is highly memory-intensive.
 RAM Saver: Enforced a strict Early-Stop loop (SCRAPE_LIMIT = 5) to prevent 
 the browser from causing OOM (Out-of-Memory) crashes on our 1GB MVP server.
+Network Mode (FACEBOOK_MODE=network, default): listings are read from the
+JSON the page already receives instead of rendered card text; the DOM path
+remains as the fallback and as FACEBOOK_MODE=dom.
 ================================================================================
 """
 from __future__ import annotations
+
+from contextlib import ExitStack, contextmanager
+import json
+import os
 import re
+import time
+
 from ..utils import parse_price
+from ..utils.ratelimit import domain_slot
 
-def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
-    # --- CONFIGURATION & RAM SAVER ---
-    # Critical for 1GB RAM Servers: Limits the DOM objects in memory.
-    SCRAPE_LIMIT = 5 
-    # ---------------------------------
+# --- CONFIGURATION & RAM SAVER ---
+# Critical for 1GB RAM Servers: Limits the DOM objects in memory.
+SCRAPE_LIMIT = 5
+# ---------------------------------
+
+CARD_SELECTOR = 'a[href*="/marketplace/item/"]'
+# Cards handed back from the page per scrape; filters below still need some slack.
+CANDIDATE_LIMIT = SCRAPE_LIMIT * 8
+# Known IDs sent to the page for in-page filtering when the history is a store.
+SEEN_IDS_LIMIT = 500
+
+# "network" reads listings from the JSON the page fetches (GraphQL and the
+# server-rendered document); "dom" only reads rendered cards. Network mode falls
+# back to the DOM when nothing was captured.
+DEFAULT_MODE = "network"
+NETWORK_WAIT_SECONDS = 5.0
+JSON_SCRIPT_PATTERN = re.compile(r'<script type="application/json"[^>]*>(.*?)</script>', re.DOTALL)
+
+EXTRACT_CARDS_JS = """
+(cards, args) => {
+    const seen = new Set(args.seen);
+    const emitted = new Set();
+    const records = [];
+    const known = [];
+    for (const card of cards) {
+        const match = (card.getAttribute("href") || "").match(/\\/marketplace\\/item\\/(\\d+)/);
+        if (!match || emitted.has(match[1])) continue;
+        emitted.add(match[1]);
+        if (seen.has(match[1])) {
+            known.push(match[1]);
+        } else if (records.length < args.limit) {
+            records.push({id: match[1], text: card.innerText || ""});
+        }
+    }
+    return {records, known};
+}
+"""
 
-    source = client.get("sources", {}).get("facebook")
-    if not source or not source.get("active"):
-        return []
 
-    url = source.get("url")
+def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
+    url = _source_url(client)
     if not url:
         return []
 
     print("      🟦 [FB] Accessing Marketplace...")
 
     try:
-        page.goto(url)
+        with _captured_responses(page) as captured:
+            with domain_slot(url):
+                page.goto(url)
+            return _collect(page, client, seen_ids, captured)
+
+    except Exception as exc:
+        print(f"      ⚠️ [FB] Error: {exc}")
+        return []
+
+
+def scrape_batch(pages: list, tasks: list[tuple[dict, set[str]]]) -> list[list[dict]]:
+    """Scrape several clients' searches at once, one tab per search.
+
+    Each wave only waits for the navigation to commit on every tab, so the
+    pages render in parallel while results are collected tab by tab.
+    """
+    results = [[] for _ in tasks]
+    queue = [(idx, client, seen_ids, _source_url(client)) for idx, (client, seen_ids) in enumerate(tasks)]
+    queue = [entry for entry in queue if entry[3]]
+    if not pages or not queue:
+        return results
+
+    print(f"      🟦 [FB] Accessing Marketplace for {len(queue)} searches on {len(pages)} tabs...")
+
+    for start in range(0, len(queue), len(pages)):
+        with ExitStack() as stack:
+            opened = []
+            for page, (idx, client, seen_ids, url) in zip(pages, queue[start : start + len(pages)]):
+                try:
+                    captured = stack.enter_context(_captured_responses(page))
+                    with domain_slot(url):
+                        page.goto(url, wait_until="commit")
+                    opened.append((page, idx, client, seen_ids, captured))
+                except Exception as exc:
+                    print(f"      ⚠️ [FB] Error: {exc}")
+
+            for page, idx, client, seen_ids, captured in opened:
+                try:
+                    results[idx] = _collect(page, client, seen_ids, captured)
+                except Exception as exc:
+                    print(f"      ⚠️ [FB] Error: {exc}")
+
+    return results
+
+
+def _source_url(client: dict) -> str:
+    source = client.get("sources", {}).get("facebook")
+    if not source or not source.get("active"):
+        return ""
+    return source.get("url") or ""
+
+
+def _seen_item_ids(seen_ids) -> list[str]:
+    recent = getattr(seen_ids, "recent", None)
+    if recent is not None:
+        # Store-backed histories are not iterated; the newest IDs cover a result page.
+        return [key[3:] for key in recent("fb_", SEEN_IDS_LIMIT)]
+    return [key[3:] for key in seen_ids if isinstance(key, str) and key.startswith("fb_")]
+
+
+def _mode() -> str:
+    return (os.getenv("FACEBOOK_MODE") or DEFAULT_MODE).strip().lower()
+
+
+@contextmanager
+def _captured_responses(page):
+    """Record the page's GraphQL and document responses while the block runs."""
+    if _mode() != "network":
+        yield None
+        return
+
+    captured = []
+
+    def _on_response(response) -> None:
         try:
-            # Wait for the feed to load (max 8s to avoid zombie processes)
-            page.wait_for_selector('a[href*="/marketplace/item/"]', timeout=8000)
+            if "/api/graphql" in response.url or response.request.resource_type == "document":
+                captured.append(response)
         except Exception:
-            return []
+            pass
 
-        cards = page.query_selector_all('a[href*="/marketplace/item/"]')
-        results = []
+    page.on("response", _on_response)
+    try:
+        yield captured
+    finally:
+        try:
+            page.remove_listener("response", _on_response)
+        except Exception:
+            pass
 
-        for card in cards:
-            # [CRITICAL] RAM SAVER: Early Stop to prevent OOM (Out Of Memory)
-            if len(results) >= SCRAPE_LIMIT:
-                print(f"      🛑 [FB] Limit of {SCRAPE_LIMIT} items reached. Stopping.")
+
+def _collect(page, client: dict, seen_ids: set[str], captured: list | None = None) -> list[dict]:
+    if captured is not None:
+        listings = _captured_listings(page, captured)
+        if listings:
+            return _listing_offers(listings, client, seen_ids)
+        print("      [FB] No listings in network responses, reading the page instead.")
+
+    try:
+        # Wait for the feed to load (max 8s to avoid zombie processes)
+        page.wait_for_selector(CARD_SELECTOR, timeout=8000)
+    except Exception:
+        return []
+
+    # One evaluation returns compact {id, text} records for every unseen card,
+    # instead of two IPC round trips (href + inner_text) per listing.
+    extracted = page.eval_on_selector_all(
+        CARD_SELECTOR,
+        EXTRACT_CARDS_JS,
+        {"seen": _seen_item_ids(seen_ids), "limit": CANDIDATE_LIMIT},
+    ) or {}
+    records = extracted.get("records") or []
+    # Cards the page dropped as known are never looked up here; refresh them so
+    # retention does not expire listings that are still up.
+    touch = getattr(seen_ids, "touch", None)
+    if touch is not None and extracted.get("known"):
+        touch([f"fb_{item_id}" for item_id in extracted["known"]])
+    results = []
+
+    for record in records:
+        # [CRITICAL] RAM SAVER: Early Stop to prevent OOM (Out Of Memory)
+        if len(results) >= SCRAPE_LIMIT:
+            print(f"      🛑 [FB] Limit of {SCRAPE_LIMIT} items reached. Stopping.")
+            break
+
+        item_id = str(record.get("id") or "")
+        if not item_id:
+            continue
+
+        # Standardize ID key
+        item_key = f"fb_{item_id}"
+
+        # Deduplication Check (the page already dropped known IDs; this guards races)
+        if item_key in seen_ids:
+            continue
+
+        text_full = record.get("text") or ""
+
+        # [LOGIC RESTORED] City Target Filter
+        # Prevents fetching items from other states/cities
+        target_city = client.get("target_city", "")
+        if target_city and target_city.lower() not in text_full.lower():
+            continue
+
+        # Negative Keywords Filter
+        if any(neg in text_full.lower() for neg in client.get("negative_keywords", [])):
+            continue
+
+        # Parsing Logic
+        lines = [line.strip() for line in text_full.split("\n") if line.strip()]
+        price_str = "0"
+        for line in lines:
+            if any(char.isdigit() for char in line):
+                price_str = line
                 break
 
-            try:
-                link_raw = card.get_attribute("href")
-                if not link_raw:
-                    continue
+        price_val = parse_price(price_str)
+        
+        # Price Range Filter
+        if price_val < client.get("price_min", 0) or price_val > client.get("price_max", 999999):
+            continue
 
-                # Regex is safer/cleaner than split (Tech Lead optimization)
-                match = re.search(r"/marketplace/item/(\d+)", link_raw)
-                item_id = match.group(1) if match else None
-                
-                if not item_id:
-                    continue
+        info_extra = lines[-1] if lines else ""
 
-                # Standardize ID key
-                item_key = f"fb_{item_id}"
-                
-                # Deduplication Check
-                if item_key in seen_ids:
-                    continue
+        results.append(
+            {
+                "source": "FACEBOOK",  # Standardized English Key
+                "id": item_key,
+                "title": lines[0] if lines else "Facebook Listing",
+                "price_text": price_str,
+                "extra_info": info_extra,
+                "link": f"https://facebook.com/marketplace/item/{item_id}/",
+            }
+        )
 
-                text_full = card.inner_text() or ""
+    return results
 
-            except Exception:
-                continue
 
-            # [LOGIC RESTORED] City Target Filter
-            # Prevents fetching items from other states/cities
-            target_city = client.get("target_city", "")
-            if target_city and target_city.lower() not in text_full.lower():
-                continue
+def _captured_listings(page, captured: list) -> list[dict]:
+    # Bodies are read here rather than in the event handler, which must not block.
+    listings = []
+    parsed = 0
+    deadline = time.monotonic() + NETWORK_WAIT_SECONDS
+    while True:
+        while parsed < len(captured):
+            listings += _listings_from_response(captured[parsed])
+            parsed += 1
+        if listings or time.monotonic() >= deadline:
+            return listings
+        page.wait_for_timeout(200)
 
-            # Negative Keywords Filter
-            if any(neg in text_full.lower() for neg in client.get("negative_keywords", [])):
+
+def _listings_from_response(response) -> list[dict]:
+    try:
+        body = response.text()
+    except Exception:
+        return []
+    if "marketplace_listing_title" not in body:
+        return []
+
+    if response.request.resource_type == "document":
+        chunks = [chunk for chunk in JSON_SCRIPT_PATTERN.findall(body) if "marketplace_listing_title" in chunk]
+    else:
+        # GraphQL may stream several JSON documents, one per line.
+        chunks = [line for line in body.splitlines() if "marketplace_listing_title" in line]
+
+    listings = []
+    for chunk in chunks:
+        try:
+            listings += _walk_listings(json.loads(chunk))
+        except Exception:
+            continue
+    return listings
+
+
+def _walk_listings(node) -> list[dict]:
+    listings = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, list):
+            stack.extend(reversed(current))
+        elif isinstance(current, dict):
+            if current.get("marketplace_listing_title") and current.get("id"):
+                listings.append(current)
                 continue
+            stack.extend(reversed(list(current.values())))
+    return listings
+
+
+def _listing_offers(listings: list[dict], client: dict, seen_ids: set[str]) -> list[dict]:
+    results = []
+    emitted = set()
+
+    for listing in listings:
+        # [CRITICAL] RAM SAVER: Early Stop to prevent OOM (Out Of Memory)
+        if len(results) >= SCRAPE_LIMIT:
+            print(f"      🛑 [FB] Limit of {SCRAPE_LIMIT} items reached. Stopping.")
+            break
 
-            # Parsing Logic
-            lines = [line.strip() for line in text_full.split("\n") if line.strip()]
-            price_str = "0"
-            for line in lines:
-                if any(char.isdigit() for char in line):
-                    price_str = line
-                    break
+        item_id = str(listing.get("id") or "")
+        item_key = f"fb_{item_id}"
+        if not item_id.isdigit() or item_key in seen_ids or item_key in emitted:
+            continue
 
+        title = str(listing.get("marketplace_listing_title") or "Facebook Listing")
+        price = listing.get("listing_price") or {}
+        price_str = str(price.get("formatted_amount") or price.get("amount") or "0")
+        try:
+            price_val = float(price.get("amount"))
+        except Exception:
             price_val = parse_price(price_str)
-            
-            # Price Range Filter
-            if price_val < client.get("price_min", 0) or price_val > client.get("price_max", 999999):
-                continue
 
-            info_extra = lines[-1] if lines else ""
+        geocode = (listing.get("location") or {}).get("reverse_geocode") or {}
+        location = ", ".join(str(part) for part in (geocode.get("city"), geocode.get("state")) if part)
 
-            results.append(
-                {
-                    "source": "FACEBOOK",  # Standardized English Key
-                    "id": item_key,
-                    "title": lines[0] if lines else "Facebook Listing",
-                    "price_text": price_str,
-                    "extra_info": info_extra,
-                    "link": f"https://facebook.com/marketplace/item/{item_id}/",
-                }
-            )
+        # City Target Filter
+        target_city = client.get("target_city", "")
+        if target_city and target_city.lower() not in f"{title} {location}".lower():
+            continue
 
-        return results
+        # Negative Keywords Filter
+        if any(neg in title.lower() for neg in client.get("negative_keywords", [])):
+            continue
 
-    except Exception as exc:
-        print(f"      ⚠️ [FB] Error: {exc}")
-        return []
+        # Price Range Filter
+        if price_val < client.get("price_min", 0) or price_val > client.get("price_max", 999999):
+            continue
+
+        emitted.add(item_key)
+        results.append(
+            {
+                "source": "FACEBOOK",
+                "id": item_key,
+                "title": title,
+                "price_text": price_str,
+                "extra_info": location,
+                "link": f"https://facebook.com/marketplace/item/{item_id}/",
+            }
+        )
+
+    return results
@@ -0,0 +1,249 @@
+﻿"""
+================================================================================
+DATA ADAPTER: MERCADO LIVRE (HTTP + EMBEDDED JSON / PUBLIC SEARCH API)
+================================================================================
+FUNCTION:
+Acts as a translation layer (Driver) between Mercado Livre search results and
+the standardized JSON format of GarimpoBot.
+
+[COMPLIANCE ALIGNMENT]
+Operates in 'Stateless' mode: anonymous GETs only, throttled by the shared
+per-domain rate limiter.
+
+[PERFORMANCE]
+The listing page ships its results as JSON (__PRELOADED_STATE__), so one pooled
+HTTP request replaces a browser render. If the page yields nothing, the public
+search endpoint (api.mercadolibre.com) is queried instead.
+RAM Saver: Same strict Early-Stop (SCRAPE_LIMIT = 5) as the other agents.
+================================================================================
+"""
+from __future__ import annotations
+
+import json
+import re
+import urllib.parse
+
+from ..utils.cache import cached
+from ..utils.coalesce import coalesced
+from ..utils.http_client import http_get
+from ..utils.urls import build_mercado_livre_url
+
+SEARCH_ENDPOINT = "https://api.mercadolibre.com/sites/{site}/search"
+PAGE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "pt-BR,pt;q=0.9,en;q=0.8",
+}
+STATE_PATTERNS = (
+    re.compile(r'<script[^>]+id="__PRELOADED_STATE__"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE),
+    re.compile(r"window\.__PRELOADED_STATE__\s*=\s*(\{.*?\});?\s*</script>", re.DOTALL),
+)
+# Item IDs look like MLB4400954611 (site prefix + number); the number is the stable key.
+ITEM_ID_PATTERN = re.compile(r"^ML[A-Z]-?(\d+)$")
+
+
+def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
+    # --- CONFIGURATION & RAM SAVER ---
+    SCRAPE_LIMIT = 5
+    # ---------------------------------
+
+    source = client.get("sources", {}).get("mercado_livre")
+    if not source or not source.get("active"):
+        return []
+
+    search_term = client.get("search_term", "")
+    price_min = client.get("price_min", 0)
+    price_max = client.get("price_max", 999999)
+    url = source.get("url") or build_mercado_livre_url(search_term, price_min, price_max)
+
+    print("       [ML] Reading search results...")
+
+    items = _fetch_items(url)
+    if not items and search_term:
+        items = _fetch_api_items(source.get("site_id") or "MLB", search_term, price_min, price_max)
+
+    results = []
+    for item in items:
+        # [CRITICAL] RAM SAVER: Early Stop to prevent memory overload
+        if len(results) >= SCRAPE_LIMIT:
+            print(f"       [ML] Limit of {SCRAPE_LIMIT} items reached. Stopping.")
+            break
+
+        item_key = f"ml_{item['id']}"
+
+        # Deduplication Check
+        if item_key in seen_ids:
+            continue
+
+        title = item.get("title") or "Mercado Livre Listing"
+        location = item.get("location", "")
+
+        # City Target Filter (only when the listing states a location)
+        target_city = client.get("target_city", "")
+        if target_city and location and target_city.lower() not in location.lower():
+            continue
+
+        # Negative Keywords Filter
+        if any(neg in title.lower() for neg in client.get("negative_keywords", [])):
+            continue
+
+        price_val = item.get("price") or 0.0
+        if price_val < price_min or price_val > price_max:
+            continue
+
+        results.append(
+            {
+                "source": "MERCADO LIVRE",
+                "id": item_key,
+                "title": title,
+                "price_text": _format_price(price_val, item.get("currency", "")),
+                "extra_info": location,
+                # Listings without a location passed the city check above; tag
+                # them with the target city so the engine's city filter keeps them.
+                "region": location or target_city,
+                "link": item.get("link", ""),
+            }
+        )
+
+    return results
+
+
+def _fetch_items(url: str) -> list[dict]:
+    # Clients with the same search share one download per cycle and a recent one across cycles.
+    return coalesced(("mercado_livre", url), lambda: cached("mercado_livre", url, lambda: _download_page(url)))
+
+
+def _fetch_api_items(site: str, search_term: str, price_min: float, price_max: float) -> list[dict]:
+    params = {"q": search_term, "limit": "20"}
+    if price_min or (price_max and price_max < 999999):
+        params["price"] = f"{int(price_min or 0)}-{int(price_max) if price_max < 999999 else '*'}"
+    url = f"{SEARCH_ENDPOINT.format(site=site)}?{urllib.parse.urlencode(params)}"
+    return coalesced(("mercado_livre", url), lambda: cached("mercado_livre", url, lambda: _download_api(url)))
+
+
+def _download_page(url: str) -> list[dict]:
+    try:
+        response = http_get(url, headers=PAGE_HEADERS)
+    except Exception:
+        return []
+    if not response.ok:
+        return []
+    return _extract_items(response.body.decode("utf-8", errors="replace"))
+
+
+def _download_api(url: str) -> list[dict]:
+    try:
+        response = http_get(url, headers={"Accept": "application/json"})
+    except Exception:
+        return []
+    if not response.ok:
+        return []
+    try:
+        payload = json.loads(response.body.decode("utf-8"))
+    except Exception:
+        return []
+    return _collect_items(payload.get("results") or [])
+
+
+def _extract_items(html: str) -> list[dict]:
+    for pattern in STATE_PATTERNS:
+        match = pattern.search(html or "")
+        if not match:
+            continue
+        try:
+            return _collect_items(json.loads(match.group(1)))
+        except Exception:
+            continue
+    return []
+
+
+def _collect_items(node) -> list[dict]:
+    """Walk the page state (or API results) and normalize every listing found, in order."""
+    items = []
+    emitted = set()
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, list):
+            stack.extend(reversed(current))
+            continue
+        if not isinstance(current, dict):
+            continue
+        item = _normalize(current)
+        if item is not None:
+            if item["id"] not in emitted:
+                emitted.add(item["id"])
+                items.append(item)
+            continue
+        stack.extend(reversed(list(current.values())))
+    return items
+
+
+def _normalize(entry: dict) -> dict | None:
+    card = entry.get("polycard")
+    if isinstance(card, dict):
+        # Current search pages: listing data is split into typed "components".
+        metadata = card.get("metadata") or {}
+        item = {"id": _numeric_id(metadata.get("id")), "link": _absolute(metadata.get("url"))}
+        for component in card.get("components") or []:
+            kind = component.get("type") if isinstance(component, dict) else None
+            if kind == "title":
+                item["title"] = (component.get("title") or {}).get("text", "")
+            elif kind == "price":
+                current = (component.get("price") or {}).get("current_price") or {}
+                item["price"] = _to_float(current.get("value"))
+                item["currency"] = current.get("currency", "")
+            elif kind == "location":
+                item["location"] = (component.get("location") or {}).get("text", "")
+    elif isinstance(entry.get("id"), str) and entry.get("title") and ITEM_ID_PATTERN.match(entry["id"]):
+        # API results and older page states.
+        price = entry.get("price")
+        if isinstance(price, dict):
+            currency = price.get("currency_id", "")
+            price = price.get("amount")
+        else:
+            currency = entry.get("currency_id", "")
+        address = entry.get("address") or {}
+        location = ", ".join(part for part in (address.get("city_name"), address.get("state_name")) if part)
+        item = {
+            "id": _numeric_id(entry["id"]),
+            "title": entry.get("title", ""),
+            "price": _to_float(price),
+            "currency": currency,
+            "location": location or str(entry.get("location") or ""),
+            "link": _absolute(entry.get("permalink") or entry.get("url")),
+        }
+    else:
+        return None
+    if not item.get("id") or not item.get("title"):
+        return None
+    return item
+
+
+def _numeric_id(raw) -> str:
+    match = ITEM_ID_PATTERN.match(str(raw or ""))
+    return match.group(1) if match else ""
+
+
+def _absolute(url) -> str:
+    url = str(url or "").split("#", 1)[0]
+    if url and "://" not in url:
+        url = "https://" + url.lstrip("/")
+    return url
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return 0.0
+
+
+def _format_price(value: float, currency: str) -> str:
+    if not value:
+        return ""
+    symbol = "R$" if currency in {"", "BRL"} else currency
+    return f"{symbol} {value:,.0f}".replace(",", ".")
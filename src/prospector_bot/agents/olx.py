@@ -0,0 +1,171 @@
+﻿"""
+================================================================================
+DATA ADAPTER: OLX MARKETPLACE (HTTP + EMBEDDED JSON)
+================================================================================
+FUNCTION:
+Acts as a translation layer (Driver) between OLX search result pages and the
+standardized JSON format of GarimpoBot.
+
+[COMPLIANCE ALIGNMENT]
+Operates in 'Stateless' mode: a single anonymous GET per search page, no login,
+no interaction, throttled by the shared per-domain rate limiter.
+
+[PERFORMANCE]
+OLX renders its result list from the Next.js state embedded in the page
+(<script id="__NEXT_DATA__">). Reading that JSON over the pooled HTTP client
+gives the same listings as a browser scrape without launching Chromium.
+RAM Saver: Same strict Early-Stop (SCRAPE_LIMIT = 5) as the other agents.
+================================================================================
+"""
+from __future__ import annotations
+
+import json
+import re
+
+from ..utils import parse_price
+from ..utils.cache import cached
+from ..utils.coalesce import coalesced
+from ..utils.http_client import http_get
+from ..utils.urls import build_olx_url
+
+# OLX answers unknown user agents with a bot challenge instead of the result page.
+PAGE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml",
+    "Accept-Language": "pt-BR,pt;q=0.9,en;q=0.8",
+}
+NEXT_DATA_PATTERN = re.compile(
+    r'<script[^>]+id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL | re.IGNORECASE
+)
+
+
+def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
+    # --- CONFIGURATION & RAM SAVER ---
+    SCRAPE_LIMIT = 5
+    # ---------------------------------
+
+    source = client.get("sources", {}).get("olx")
+    if not source or not source.get("active"):
+        return []
+
+    url = source.get("url") or build_olx_url(
+        client.get("search_term", ""),
+        client.get("price_min", 0),
+        client.get("price_max", 999999),
+        client.get("target_city", ""),
+    )
+
+    print("       [OLX] Reading search page...")
+
+    ads = _fetch_ads(url)
+    results = []
+
+    for ad in ads:
+        # [CRITICAL] RAM SAVER: Early Stop to prevent memory overload
+        if len(results) >= SCRAPE_LIMIT:
+            print(f"       [OLX] Limit of {SCRAPE_LIMIT} items reached. Stopping.")
+            break
+
+        list_id = ad.get("listId")
+        if not list_id:
+            continue
+
+        item_key = f"olx_{list_id}"
+
+        # Deduplication Check
+        if item_key in seen_ids:
+            continue
+
+        title = ad.get("subject") or ad.get("title") or "OLX Listing"
+        location = _location(ad)
+
+        # City Target Filter
+        target_city = client.get("target_city", "")
+        if target_city and target_city.lower() not in location.lower():
+            continue
+
+        # Negative Keywords Filter
+        if any(neg in title.lower() for neg in client.get("negative_keywords", [])):
+            continue
+
+        price_text = str(ad.get("price") or "")
+        price_val = _parse_brl(price_text)
+        if price_val < client.get("price_min", 0) or price_val > client.get("price_max", 999999):
+            continue
+
+        results.append(
+            {
+                "source": "OLX",
+                "id": item_key,
+                "title": title,
+                "price_text": price_text,
+                "extra_info": location,
+                "region": location,
+                "link": ad.get("url") or ad.get("friendlyUrl") or "",
+            }
+        )
+
+    return results
+
+
+def _fetch_ads(url: str) -> list[dict]:
+    # Clients with the same search share one download per cycle and a recent one across cycles.
+    return coalesced(("olx", url), lambda: cached("olx", url, lambda: _download_ads(url)))
+
+
+def _download_ads(url: str) -> list[dict]:
+    try:
+        response = http_get(url, headers=PAGE_HEADERS)
+    except Exception:
+        return []
+    if not response.ok:
+        return []
+    return _extract_ads(response.body.decode("utf-8", errors="replace"))
+
+
+def _extract_ads(html: str) -> list[dict]:
+    match = NEXT_DATA_PATTERN.search(html or "")
+    if not match:
+        return []
+    try:
+        state = json.loads(match.group(1))
+    except Exception:
+        return []
+    ads = (state.get("props", {}).get("pageProps", {}) or {}).get("ads")
+    if not isinstance(ads, list):
+        # The page layout moves between deploys; fall back to the first list of listings.
+        ads = _find_ads(state) or []
+    # Entries without a listId are banners and sponsored slots.
+    return [ad for ad in ads if isinstance(ad, dict) and ad.get("listId")]
+
+
+def _find_ads(node) -> list | None:
+    if isinstance(node, list):
+        if any(isinstance(item, dict) and "listId" in item for item in node):
+            return node
+        children = node
+    elif isinstance(node, dict):
+        children = node.values()
+    else:
+        return None
+    for child in children:
+        found = _find_ads(child)
+        if found is not None:
+            return found
+    return None
+
+
+def _location(ad: dict) -> str:
+    details = ad.get("locationDetails") or {}
+    if isinstance(details, dict) and details.get("municipality"):
+        parts = [details.get("neighbourhood"), details.get("municipality"), details.get("uf")]
+        return ", ".join(str(part) for part in parts if part)
+    return str(ad.get("location") or "")
+
+
+def _parse_brl(text: str) -> float:
+    # "R$ 1.500" uses dots as thousands separators; parse_price would read 1.5.
+    return parse_price(str(text or "").replace(".", ""))
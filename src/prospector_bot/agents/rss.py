@@ -23,16 +23,21 @@ def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
 
     results = []
     for url in urls:
+        # Shared with every client on this feed (one download per cycle, cached
+        # across cycles, conditional requests); the list must stay read-only.
         items = fetch_rss_items(url)
-        if not items:
-            continue
         domain = _domain_from_url(url)
-        for item in items:
+        for index, item in enumerate(items):
             link = item.get("link") or ""
-            guid = item.get("guid") or link
-            item_key = f"rss_{_stable_id(guid or link)}"
+            item_key = _item_key(item)
+            # Feeds list newest first: everything after the first item already
+            # alerted on is older, so the scan stops there. The skipped items are
+            # refreshed rather than looked up, so retention keeps them.
             if item_key in seen_ids:
-                continue
+                touch = getattr(seen_ids, "touch", None)
+                if touch is not None:
+                    touch([_item_key(rest) for rest in items[index + 1 :]])
+                break
 
             title = item.get("title") or "RSS Listing"
             description = item.get("description", "")
@@ -62,6 +67,12 @@ def scrape(page, client: dict, seen_ids: set[str]) -> list[dict]:
     return results
 
 
+def _item_key(item: dict) -> str:
+    link = item.get("link") or ""
+    guid = item.get("guid") or link
+    return f"rss_{_stable_id(guid or link)}"
+
+
 def _domain_from_url(url: str) -> str:
     try:
         parsed = urlparse(url)
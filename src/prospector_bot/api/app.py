@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 import threading
+import time
 from typing import Any
 
 from fastapi import Depends, FastAPI, HTTPException, Request
@@ -11,7 +12,9 @@ from pydantic import BaseModel
 from ..ai_client import AIClient
 from ..engine import run_scraper_loop
 from ..settings import load_settings
-from ..storage import normalize_client, save_preferences, upsert_client
+from ..storage import normalize_client, record_client_change, record_client_removal, upsert_client
+from ..utils.cache import cache_stats
+from ..utils.http_client import http_stats
 
 
 class ParseRequest(BaseModel):
@@ -31,11 +34,16 @@ class ClientPayload(BaseModel):
     persona: str | None = None
     negative_keywords: list[str] | None = None
     sources: dict | None = None
+    tier: str | None = None
+    boost_until: float | None = None
 
     class Config:
         extra = "allow"
 
 
+class BoostRequest(BaseModel):
+    minutes: float = 60
+
 
 class PreferencePayload(BaseModel):
     chat_id: str | None = None
@@ -262,7 +270,7 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
             merged = _merge_payload(existing, data)
             normalized = normalize_client(merged)
             state["clients"] = upsert_client(state.get("clients", []), normalized)
-            save_preferences(app.state.settings, state["clients"])
+            record_client_change(app.state.settings, _find_client(state["clients"], chat_id) or normalized)
             return normalized
 
     @app.put("/clients/{chat_id}", dependencies=[guard])
@@ -276,7 +284,7 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
             merged = _merge_payload(existing, data)
             normalized = normalize_client(merged)
             state["clients"] = upsert_client(state.get("clients", []), normalized)
-            save_preferences(app.state.settings, state["clients"])
+            record_client_change(app.state.settings, _find_client(state["clients"], chat_id) or normalized)
             return normalized
 
     @app.delete("/clients/{chat_id}", dependencies=[guard])
@@ -286,7 +294,7 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
         with lock:
             clients = [c for c in state.get("clients", []) if str(c.get("chat_id")) != str(chat_id)]
             state["clients"] = clients
-            save_preferences(app.state.settings, clients)
+            record_client_removal(app.state.settings, chat_id)
         return {"status": "deleted"}
 
     @app.post("/clients/{chat_id}/pause", dependencies=[guard])
@@ -297,6 +305,19 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
     def resume_client(chat_id: str) -> dict:
         return _set_client_active(app, chat_id, True)
 
+    @app.post("/clients/{chat_id}/boost", dependencies=[guard])
+    def boost_client(chat_id: str, payload: BoostRequest) -> dict:
+        state = app.state.state
+        lock = _get_lock(state)
+        with lock:
+            client = _find_client(state.get("clients", []), chat_id)
+            if not client:
+                raise HTTPException(status_code=404, detail="client not found")
+            client["boost_until"] = time.time() + max(payload.minutes, 0) * 60
+            record_client_change(app.state.settings, client)
+            boost_until = client["boost_until"]
+        return {"status": "ok", "boost_until": boost_until}
+
     @app.post("/parse", dependencies=[guard])
     def parse_message(payload: ParseRequest) -> dict:
         reply, data = app.state.ai_client.parse_message(payload.message, payload.locale)
@@ -338,6 +359,14 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
             state["running"] = False
         return {"status": "stopping"}
 
+    @app.get("/engine/stats", dependencies=[guard])
+    def engine_stats() -> dict:
+        state = app.state.state
+        lock = _get_lock(state)
+        with lock:
+            scans = dict(state.get("engine_stats") or {})
+        return {"scans": scans, "http": http_stats(), "cache": cache_stats()}
+
     @app.get("/api/preferences", dependencies=[guard])
     def list_preferences() -> dict:
         state = app.state.state
@@ -361,7 +390,7 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
         lock = _get_lock(state)
         with lock:
             state["clients"] = upsert_client(state.get("clients", []), normalized)
-            save_preferences(app.state.settings, state["clients"])
+            record_client_change(app.state.settings, _find_client(state["clients"], chat_id) or normalized)
         return {"success": True, "data": _client_to_preference(normalized)}
 
     @app.put("/api/preferences/{index}", dependencies=[guard])
@@ -380,7 +409,9 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
             normalized = normalize_client(merged)
             clients[index] = normalized
             state["clients"] = clients
-            save_preferences(app.state.settings, clients)
+            if str(existing.get("chat_id")) != str(normalized.get("chat_id")):
+                record_client_removal(app.state.settings, existing.get("chat_id"))
+            record_client_change(app.state.settings, normalized)
         return {"success": True, "data": _client_to_preference(normalized)}
 
     @app.delete("/api/preferences/{index}", dependencies=[guard])
@@ -391,9 +422,9 @@ def create_app(state: dict | None = None, settings=None, ai_client=None, bot=Non
             clients = list(state.get("clients", []))
             if index < 0 or index >= len(clients):
                 raise HTTPException(status_code=404, detail="preference not found")
-            clients.pop(index)
+            removed = clients.pop(index)
             state["clients"] = clients
-            save_preferences(app.state.settings, clients)
+            record_client_removal(app.state.settings, removed.get("chat_id"))
         return {"success": True}
 
     @app.post("/api/search", dependencies=[guard])
@@ -485,7 +516,7 @@ def _set_client_active(app: FastAPI, chat_id: str, active: bool) -> dict:
         if not client:
             raise HTTPException(status_code=404, detail="client not found")
         client["active"] = active
-        save_preferences(app.state.settings, state["clients"])
+        record_client_change(app.state.settings, client)
     return {"status": "ok", "active": active}
 
 def _client_to_preference(client: dict) -> dict:
@@ -0,0 +1,266 @@
+﻿"""Long-lived Playwright browser context with recycling thresholds."""
+from __future__ import annotations
+
+from pathlib import Path
+from urllib.parse import urlparse
+import os
+import time
+import weakref
+
+try:
+    import psutil
+except Exception:  # pragma: no cover - optional dependency
+    psutil = None
+
+from .utils import timestamp
+
+# Network.setBlockedURLs matches URL patterns, not resource types; these
+# extensions stand in for the types it can express.
+RESOURCE_PATTERNS = {
+    "image": ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mpd*", "*.mp3*", "*.ogg*"],
+    "font": ["*.woff*", "*.ttf*", "*.otf*", "*.eot*"],
+}
+
+
+class BrowserPool:
+    """Keeps one persistent Chromium context alive across scans.
+
+    Chromium locks its ``user_data_dir``, so the logged-in session can back a
+    single context at a time; pages are handed out from it and the whole context
+    is torn down once it has served too many pages, grown too old, or its
+    process tree crosses the RSS limit. Must be used from the thread that
+    created it (Playwright's sync API is thread-bound).
+
+    Every context gets a lean profile: configured resource types (images,
+    media, fonts...) and third-party hosts are aborted before they download.
+    Blocking goes through CDP ``Network.setBlockedURLs`` on each page, which
+    unlike ``context.route`` leaves Chromium's HTTP cache on, so script and
+    style bundles are reused across navigations.
+    """
+
+    def __init__(self, settings) -> None:
+        self.settings = settings
+        self.max_pages = int(getattr(settings, "browser_max_pages", 0) or 0)
+        self.max_age = float(getattr(settings, "browser_max_age_minutes", 0) or 0) * 60
+        self.max_rss_mb = float(getattr(settings, "browser_max_rss_mb", 0) or 0)
+        self.blocked_types = {item.lower() for item in getattr(settings, "browser_block_resources", None) or []}
+        self.blocked_hosts = tuple(item.lower() for item in getattr(settings, "browser_block_hosts", None) or [])
+        self.blocked_requests = 0
+        self._blocked_patterns = self._patterns_for(self.blocked_types, self.blocked_hosts)
+        unmatched = sorted(self.blocked_types - set(RESOURCE_PATTERNS))
+        if unmatched:
+            print(f"[{timestamp()}] Resource types without URL patterns are not blocked: {', '.join(unmatched)}")
+        self._prepared_pages = weakref.WeakSet()
+        self._intercepting = False
+        self._playwright = None
+        self._context = None
+        self._started_at = 0.0
+        self._pages_served = 0
+        self.launches = 0
+        if self.max_rss_mb and self.rss_mb() is None:
+            print(f"[{timestamp()}] Browser RSS cannot be measured here (no psutil or /proc); RSS recycling is off.")
+
+    @property
+    def active(self) -> bool:
+        return self._context is not None or self._playwright is not None
+
+    def page(self):
+        """Return the context's main page, launching the browser if needed."""
+        context = self._ensure_context()
+        if context is None:
+            return None
+        self._pages_served += 1
+        return self._prepare(context, context.pages[0] if context.pages else context.new_page())
+
+    def new_page(self):
+        context = self._ensure_context()
+        if context is None:
+            return None
+        self._pages_served += 1
+        return self._prepare(context, context.new_page())
+
+    def stats(self) -> dict:
+        return {
+            "launches": self.launches,
+            "pages_served": self._pages_served,
+            "blocked_requests": self.blocked_requests,
+        }
+
+    def recycle_reason(self) -> str | None:
+        if self._context is None:
+            return None
+        if self.max_pages and self._pages_served >= self.max_pages:
+            return f"{self._pages_served} pages served"
+        if self.max_age and time.time() - self._started_at >= self.max_age:
+            return f"age {int((time.time() - self._started_at) / 60)} min"
+        rss = self.rss_mb()
+        if self.max_rss_mb and rss is not None and rss >= self.max_rss_mb:
+            return f"RSS {rss:.0f} MB"
+        return None
+
+    def maybe_recycle(self) -> None:
+        reason = self.recycle_reason()
+        if reason:
+            print(f"[{timestamp()}] Recycling browser ({reason}).")
+            self.close()
+
+    def rss_mb(self) -> float | None:
+        if psutil is None:
+            return _proc_children_rss_mb(os.getpid())
+        try:
+            total = 0
+            for child in psutil.Process(os.getpid()).children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except Exception:
+                    continue
+            return total / (1024 * 1024)
+        except Exception:
+            return None
+
+    def close(self) -> None:
+        if self._context:
+            try:
+                self._context.close()
+            except Exception:
+                pass
+        if self._playwright:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+        self._context = None
+        self._playwright = None
+        self._pages_served = 0
+
+    def _prepare(self, context, page):
+        if not self._blocked_patterns or self._intercepting or page in self._prepared_pages:
+            return page
+        try:
+            session = context.new_cdp_session(page)
+            session.send("Network.enable")
+            session.send("Network.setBlockedURLs", {"urls": self._blocked_patterns})
+        except Exception as exc:
+            # Not Chromium (no CDP): fall back to interception, which costs the HTTP cache.
+            print(f"[{timestamp()}] CDP blocking unavailable ({exc}); intercepting requests instead.")
+            self._install_route_blocking(context)
+            return page
+        page.on("requestfailed", self._count_blocked)
+        self._prepared_pages.add(page)
+        return page
+
+    def _count_blocked(self, request) -> None:
+        try:
+            if "BLOCKED_BY_CLIENT" in (request.failure or ""):
+                self.blocked_requests += 1
+        except Exception:
+            pass
+
+    @staticmethod
+    def _patterns_for(types: set[str], hosts: tuple[str, ...]) -> list[str]:
+        patterns = []
+        for resource_type in sorted(types):
+            patterns.extend(RESOURCE_PATTERNS.get(resource_type, []))
+        for host in hosts:
+            patterns.extend([f"*://{host}/*", f"*.{host}/*"])
+        return patterns
+
+    def _install_route_blocking(self, context) -> None:
+        self._intercepting = True
+
+        def _handle(route) -> None:
+            try:
+                request = route.request
+                if request.resource_type in self.blocked_types or self._is_blocked_host(request.url):
+                    self.blocked_requests += 1
+                    route.abort()
+                    return
+                route.continue_()
+            except Exception:
+                pass
+
+        try:
+            context.route("**/*", _handle)
+        except Exception as exc:
+            print(f"[{timestamp()}] Resource blocking unavailable: {exc}")
+
+    def _is_blocked_host(self, url: str) -> bool:
+        if not self.blocked_hosts:
+            return False
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == blocked or host.endswith("." + blocked) for blocked in self.blocked_hosts)
+
+    def _forget(self, context) -> None:
+        # Chromium crashed or was closed underneath us; relaunch on next use.
+        if self._context is context:
+            self._context = None
+
+    def _ensure_context(self):
+        if self._context is not None:
+            return self._context
+
+        if self._playwright is not None:
+            self.close()
+
+        try:
+            from playwright.sync_api import sync_playwright
+        except Exception as exc:
+            print(f"[{timestamp()}] Playwright not available: {exc}")
+            return None
+
+        playwright = sync_playwright().start()
+        try:
+            context = playwright.chromium.launch_persistent_context(
+                user_data_dir=str(self.settings.session_dir),
+                headless=self.settings.headless,
+                channel=self.settings.browser_channel,
+                viewport=None,
+            )
+        except Exception as exc:
+            print(f"[{timestamp()}] Browser launch failed: {exc}")
+            try:
+                playwright.stop()
+            except Exception:
+                pass
+            return None
+
+        self._playwright = playwright
+        self._context = context
+        context.on("close", lambda *_: self._forget(context))
+        self._intercepting = False
+        self._started_at = time.time()
+        self._pages_served = 0
+        self.launches += 1
+        return context
+
+
+def _proc_children_rss_mb(pid: int) -> float | None:
+    """Summed RSS of ``pid``'s descendants read from ``/proc`` (Linux without psutil)."""
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    children: dict[int, list[int]] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            # The command name may contain spaces and parentheses; ppid follows the last ")".
+            ppid = int((entry / "stat").read_text().rsplit(")", 1)[1].split()[1])
+        except Exception:
+            continue
+        children.setdefault(ppid, []).append(int(entry.name))
+
+    total_kb = 0
+    stack = list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        stack.extend(children.get(child, []))
+        try:
+            for line in (proc / str(child) / "status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total_kb += int(line.split()[1])
+                    break
+        except Exception:
+            continue
+    return total_kb / 1024
@@ -16,122 +16,436 @@ of anti-bot systems, ensuring zero downtime for the MVP validation.
 [PRODUCT & TECH LEAD - GABRIEL]
 Infrastructure Cost (Q1): The MVP is hosted on an ultra-low-budget 1GB RAM VPS.
 Architecture Solution: Playwright (Chromium) causes severe memory leaks if left 
-open indefinitely. This engine is designed to explicitly launch and DESTROY 
-the browser context at the end of each cycle. This "self-cleaning" architecture 
-prevents "Zombie Processes" and guarantees the server never crashes from OOM 
-(Out Of Memory).
+open indefinitely. The engine keeps one context alive in `BrowserPool` and 
+DESTROYS it as soon as it crosses a page-count, age or RSS threshold. This 
+"self-cleaning" architecture prevents "Zombie Processes" and guarantees the 
+server never crashes from OOM (Out Of Memory) without paying the launch cost 
+on every cycle.
 ================================================================================
 """
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor, wait
 import datetime
 import threading
 import time
 
 from .agents import AGENTS
+from .browser import BrowserPool
 from .filters import filter_by_city
 from .i18n import select_locale, t
-from .storage import load_seen_history, save_seen_history
+from .scheduler import CapacityBudget, FeedActivity, RunBudget, ScanScheduler, TierPolicy
+from .storage import close_seen_history, load_seen_history, save_seen_history
 from .telegram_handlers import safe_send
 from .utils import timestamp
+from .utils.cache import cache_max_age, configure_cache
+from .utils.coalesce import end_cycle, start_cycle
+from .utils.http_client import configure_http, count_requests
+from .utils.ratelimit import configure_rate_limits
+
+
+IDLE_POLL_SECONDS = 5.0
+# How often a queued or running pooled scan is checked against its budget.
+BUDGET_POLL_SECONDS = 0.05
 
 
 def run_scraper_loop(settings, state, bot) -> None:
     seen_history = load_seen_history(settings)
+    workers = max(int(getattr(settings, "scan_workers", 1) or 1), 1)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prospector-scan")
+    # Politeness is enforced per host by the shared limiter, not by engine sleeps.
+    configure_rate_limits(getattr(settings, "domain_rate_limits", ""))
+    configure_http(settings)
+    configure_cache(settings)
+
+    # "continuous" spreads each client's scans across the interval and only wakes
+    # when a job is due; "cycle" keeps the legacy scan-everything-then-sleep rhythm.
+    continuous = getattr(settings, "scheduler_mode", "continuous") != "cycle"
+    interval_seconds = max(settings.interval_minutes, 0.1) * 60
+    scheduler = ScanScheduler(
+        interval_seconds,
+        jitter=getattr(settings, "scan_jitter", 0.0) if continuous else 0.0,
+        spread=continuous,
+        policy=TierPolicy.from_settings(settings, interval_seconds) if continuous else None,
+        request_budget=CapacityBudget(getattr(settings, "request_budget_per_minute", 0)),
+        browser_budget=CapacityBudget(getattr(settings, "browser_seconds_per_minute", 0)),
+        activity=_feed_activity(settings) if continuous else None,
+    )
+
+    browser_pool = BrowserPool(settings)
+    budget = RunBudget.from_settings(settings)
+    # HTTP scans that outlived their budget keep running on the pool; their
+    # offers are delivered once they finish, and their job waits until then.
+    late: dict = {}
+
+    mode = "continuous" if continuous else "cycle"
+    print(f"[{timestamp()}] Prospector engine started ({mode} mode, {workers} scan workers).")
+
+    try:
+        while state.get("running", True):
+            if late and _collect_late(settings, state, bot, late, seen_history, scheduler, budget):
+                save_seen_history(settings, seen_history)
+
+            active_clients = _get_active_clients(state)
+            scheduler.sync(active_clients, AGENTS, time.time())
+
+            # Checked every iteration, not only after browser batches, so an
+            # idle or oversized Chromium never outlives its thresholds.
+            if scheduler.has_browser_jobs():
+                browser_pool.maybe_recycle()
+            elif browser_pool.active:
+                print(f"[{timestamp()}] No browser sources scheduled. Closing browser.")
+                browser_pool.close()
+
+            if not active_clients:
+                print(f"[{timestamp()}] No active clients. Waiting...")
+                _wait(state, interval_seconds)
+                continue
+
+            jobs = scheduler.pop_due(time.time())
+            if not jobs:
+                next_due = scheduler.next_due()
+                delay = IDLE_POLL_SECONDS if next_due is None else next_due - time.time()
+                # Poll faster while overrun scans may finish and need delivering.
+                _wait(state, min(max(delay, 0.1), 1.0 if late else IDLE_POLL_SECONDS))
+                continue
+
+            clients = {str(client.get("chat_id")): client for client in active_clients}
+            deferred = _run_batch(
+                settings, state, bot, executor, jobs, clients, seen_history, scheduler, browser_pool, budget, late
+            )
+
+            finished = time.time()
+            for job in jobs:
+                if job.key in deferred:
+                    scheduler.defer(job, finished + IDLE_POLL_SECONDS)
+                else:
+                    scheduler.reschedule(job, finished)
+
+            _set_last_scan(state)
+            _set_engine_stats(state, budget, seen_history, browser_pool)
+            if not continuous:
+                print(f"[{timestamp()}] Waiting {settings.interval_minutes} minutes...")
+    finally:
+        browser_pool.close()
+        executor.shutdown(wait=False)
+        close_seen_history(seen_history)
+
+
+def _run_batch(
+    settings, state, bot, executor, jobs, clients: dict, seen_history: dict, scheduler, browser_pool, budget, late: dict
+) -> set:
+    """Run one batch of due jobs; returns the keys of jobs deferred to the next slot."""
+    agents = {agent.name: agent for agent in AGENTS}
+    browser_jobs = []
+    deferred = set()
+    new_ids = 0
+
+    budget.start(time.time())
+    start_cycle()
+    try:
+        client_count = len({job.chat_id for job in jobs})
+        print(f"[{timestamp()}] Scanning {len(jobs)} due sources for {client_count} clients...")
+
+        # HTTP agents fan out on the worker pool; Playwright's sync API is bound
+        # to this thread, so browser agents and all result handling stay here.
+        pending = []
+        for job in jobs:
+            client = clients.get(job.chat_id)
+            agent = agents.get(job.agent)
+            if not client or not agent:
+                continue
+            if job.key in late:
+                deferred.add(job.key)
+                scheduler.record_requests(job, 0, time.time())
+                continue
+            if agent.requires_browser:
+                browser_jobs.append((job, client, agent))
+                continue
+            seen_ids = _UnseenCounter(_seen_for(seen_history, job.chat_id))
+            run: dict = {}
+            future = executor.submit(_run_agents, [agent], None, client, seen_ids, scheduler.result_max_age(job), run)
+            pending.append((job, client, seen_ids, future, run))
+
+        if browser_jobs:
+            new_ids += _run_browser_jobs(
+                settings, state, bot, browser_jobs, seen_history, scheduler, browser_pool, budget, deferred
+            )
+
+        for job, client, seen_ids, future, run in pending:
+            chat_id = str(client.get("chat_id"))
+            outcome = _await_scan(future, run, budget, chat_id, job.agent)
+            if outcome == "deferred":
+                deferred.add(job.key)
+                scheduler.record_requests(job, 0, time.time())
+                continue
+            if outcome == "late":
+                late[job.key] = (job, client, seen_ids, future, run)
+                continue
+            scheduler.record_requests(job, run.get("requests", 0), time.time())
+            try:
+                offers = future.result()
+            except Exception as exc:
+                print(f"[{timestamp()}] Scan failed for {chat_id}: {exc}")
+                continue
+            budget.charge(chat_id, run.get("finished", time.time()) - run.get("started", time.time()))
+            scheduler.record_result(job, seen_ids.unseen)
+            new_ids += _handle_offers(settings, state, bot, client, chat_id, offers, _seen_for(seen_history, chat_id))
 
-    print(f"[{timestamp()}] Prospector engine started.")
-
-    while state.get("running", True):
-        active_clients = _get_active_clients(state)
+        if new_ids:
+            save_seen_history(settings, seen_history)
 
-        if not active_clients:
-            print(f"[{timestamp()}] No active clients. Waiting...")
-            _sleep(settings.interval_minutes)
+    except Exception as exc:
+        print(f"[{timestamp()}] Cycle error: {exc}")
+    finally:
+        coalescing = end_cycle()
+        if coalescing.get("coalesced"):
+            print(
+                f"[{timestamp()}] Source requests: {coalescing['fetches']} fetched, "
+                f"{coalescing['coalesced']} shared between clients."
+            )
+        if browser_jobs:
+            browser_pool.maybe_recycle()
+
+    budget.deferred += len(deferred)
+    overdue = len(late) + len(deferred)
+    if overdue:
+        print(f"[{timestamp()}] Time budget: {len(deferred)} sources deferred, {len(late)} still running.")
+    return deferred
+
+
+def _await_scan(future, run: dict, budget, chat_id: str, agent: str) -> str:
+    """Wait for a pooled scan within its budget: ``"done"``, ``"late"`` or ``"deferred"``.
+
+    Agent and client limits count from when a worker picked the scan up, not
+    from when it was queued. A scan still queued once its client or the cycle
+    is out of budget is cancelled and deferred to the next slot.
+    """
+    while not future.done():
+        now = time.time()
+        started = run.get("started")
+        if started is None:
+            if budget.blocked(chat_id, now) and future.cancel():
+                return "deferred"
+        else:
+            deadline, reason = budget.limit_for(chat_id, agent, started)
+            if deadline is not None and now >= deadline:
+                budget.overrun(reason)
+                return "late"
+        wait([future], timeout=BUDGET_POLL_SECONDS)
+    return "done"
+
+
+def _run_browser_jobs(
+    settings, state, bot, browser_jobs, seen_history: dict, scheduler, browser_pool, budget, deferred: set
+) -> int:
+    new_ids = 0
+    max_tabs = max(int(getattr(settings, "browser_max_tabs", 1) or 1), 1)
+
+    grouped: dict[str, list] = {}
+    for job, client, agent in browser_jobs:
+        grouped.setdefault(agent.name, []).append((job, client, agent))
+
+    for group in grouped.values():
+        agent = group[0][2]
+        now = time.time()
+        runnable = []
+        for entry in group:
+            if budget.blocked(entry[0].chat_id, now):
+                deferred.add(entry[0].key)
+            else:
+                runnable.append(entry)
+        if not runnable:
             continue
 
-        requires_browser = _needs_browser(active_clients)
-        playwright = None
-        browser = None
-        page = None
+        seen = [_UnseenCounter(_seen_for(seen_history, job.chat_id)) for job, _, _ in runnable]
+        if agent.batch_handler and max_tabs > 1 and len(runnable) > 1:
+            # Tabs share one deadline: the tightest limit of any client in the batch.
+            limits = [budget.limit_for(job.chat_id, agent.name, now) for job, _, _ in runnable]
+            deadline, reason = min((limit for limit in limits if limit[0] is not None), default=(None, ""))
+            results = _run_batch_handler(agent, runnable, seen, browser_pool, max_tabs, deadline)
+            per_job = (time.time() - now) / len(runnable)
+            for job, _, _ in runnable:
+                budget.charge(job.chat_id, per_job)
+                scheduler.record_browser_time(per_job)
+            if deadline is not None and time.time() > deadline:
+                budget.overrun(reason)
+        else:
+            results = []
+            page = browser_pool.page()
+            for (job, client, _), seen_ids in zip(runnable, seen):
+                started = time.time()
+                if budget.blocked(job.chat_id, started):
+                    deferred.add(job.key)
+                    results.append(None)
+                    continue
+                deadline, reason = budget.limit_for(job.chat_id, agent.name, started)
+                _limit_page(page, deadline, started)
+                results.append(_run_agents([agent], page, client, seen_ids) if page else [])
+                finished = time.time()
+                budget.charge(job.chat_id, finished - started)
+                scheduler.record_browser_time(finished - started)
+                if deadline is not None and finished > deadline:
+                    budget.overrun(reason)
+
+        for (job, client, _), seen_ids, offers in zip(runnable, seen, results):
+            if offers is None:
+                continue
+            chat_id = str(client.get("chat_id"))
+            scheduler.record_result(job, seen_ids.unseen)
+            new_ids += _handle_offers(settings, state, bot, client, chat_id, offers, _seen_for(seen_history, chat_id))
+    return new_ids
+
+
+def _run_batch_handler(
+    agent, group, seen: list, browser_pool, max_tabs: int, deadline: float | None = None
+) -> list[list[dict]]:
+    pages = []
+    try:
+        for _ in range(min(max_tabs, len(group))):
+            page = browser_pool.new_page()
+            if page is None:
+                break
+            _limit_page(page, deadline, time.time())
+            pages.append(page)
+        tasks = [(client, seen_ids) for (_, client, _), seen_ids in zip(group, seen)]
+        return agent.batch_handler(pages, tasks)
+    except Exception as exc:
+        print(f"[{timestamp()}] Agent {agent.name} failed: {exc}")
+        return [[] for _ in group]
+    finally:
+        for page in pages:
+            try:
+                page.close()
+            except Exception:
+                pass
+
 
-        if requires_browser:
+def _limit_page(page, deadline: float | None, now: float) -> None:
+    # Playwright calls on this thread cannot be interrupted, so the remaining
+    # budget becomes the page's default timeout for navigation and waits.
+    if page is None or deadline is None:
+        return
+    try:
+        milliseconds = max(deadline - now, 1.0) * 1000
+        page.set_default_timeout(milliseconds)
+        page.set_default_navigation_timeout(milliseconds)
+    except Exception:
+        pass
+
+
+def _collect_late(settings, state, bot, late: dict, seen_history: dict, scheduler, budget) -> int:
+    new_ids = 0
+    for key, (job, client, seen_ids, future, run) in list(late.items()):
+        if not future.done():
+            continue
+        del late[key]
+        budget.late_results += 1
+        scheduler.record_requests(job, run.get("requests", 0), time.time())
+        chat_id = str(client.get("chat_id"))
+        try:
+            offers = future.result()
+        except Exception as exc:
+            print(f"[{timestamp()}] Scan failed for {chat_id}: {exc}")
+            continue
+        scheduler.record_result(job, seen_ids.unseen)
+        new_ids += _handle_offers(settings, state, bot, client, chat_id, offers, _seen_for(seen_history, chat_id))
+    return new_ids
+
+
+def _feed_activity(settings) -> FeedActivity | None:
+    if not getattr(settings, "adaptive_polling", False):
+        return None
+    return FeedActivity(
+        getattr(settings, "min_interval_minutes", 1.0) * 60,
+        getattr(settings, "max_interval_minutes", settings.interval_minutes) * 60,
+    )
+
+
+def _run_agents(
+    agents, page, client: dict, seen_ids: set[str], max_age: float | None = None, run: dict | None = None
+) -> list[dict]:
+    if run is not None:
+        run["started"] = time.time()
+    offers = []
+    # Cached source results are shared across clients, but never older than
+    # this job's own poll gap, or a scheduled poll would get stale data.
+    with cache_max_age(max_age), count_requests() as requests:
+        for agent in agents:
             try:
-                from playwright.sync_api import sync_playwright
+                offers += agent.handler(page, client, seen_ids)
             except Exception as exc:
-                print(f"[{timestamp()}] Playwright not available: {exc}")
-                requires_browser = False
-            else:
-                playwright = sync_playwright().start()
-                try:
-                    browser = playwright.chromium.launch_persistent_context(
-                        user_data_dir=str(settings.session_dir),
-                        headless=settings.headless,
-                        channel=settings.browser_channel,
-                        viewport=None,
-                    )
-                    page = browser.pages[0] if browser.pages else browser.new_page()
-                except Exception as exc:
-                    print(f"[{timestamp()}] Browser launch failed: {exc}")
-                    requires_browser = False
+                print(f"[{timestamp()}] Agent {agent.name} failed: {exc}")
+    if run is not None:
+        run["finished"] = time.time()
+        run["requests"] = requests[0]
+    return offers
 
-        try:
-            print(f"[{timestamp()}] Scanning for {len(active_clients)} clients...")
-
-            for client in active_clients:
-                chat_id = str(client.get("chat_id"))
-                if chat_id not in seen_history:
-                    seen_history[chat_id] = set()
-
-                offers = []
-                for agent in AGENTS:
-                    if agent.requires_browser and not page:
-                        continue
-                    try:
-                        offers += agent.handler(page, client, seen_history[chat_id])
-                    except Exception as exc:
-                        print(f"[{timestamp()}] Agent {agent.name} failed: {exc}")
-
-                city_filter = client.get("strict_city") or client.get("target_city") or ""
-                filtered = filter_by_city(offers, city_filter)
-
-                _store_offers(state, chat_id, filtered)
-
-                for offer in filtered:
-                    locale = _client_locale(client, settings)
-                    message = _format_offer_message(offer, locale)
-                    if bot:
-                        safe_send(bot, chat_id, message)
-                    else:
-                        print(f"[{timestamp()}] {message}")
-                    offer_id = offer.get("id")
-                    if offer_id:
-                        seen_history[chat_id].add(offer_id)
-
-                time.sleep(1)
 
-            save_seen_history(settings, seen_history)
+def _handle_offers(settings, state, bot, client: dict, chat_id: str, offers: list[dict], seen_ids: set[str]) -> int:
+    city_filter = client.get("strict_city") or client.get("target_city") or ""
+    filtered = filter_by_city(offers, city_filter)
 
-        except Exception as exc:
-            print(f"[{timestamp()}] Cycle error: {exc}")
-        finally:
-            if browser:
-                try:
-                    browser.close()
-                except Exception:
-                    pass
-            if playwright:
-                try:
-                    playwright.stop()
-                except Exception:
-                    pass
+    _store_offers(state, chat_id, filtered)
 
-        _set_last_scan(state)
-        print(f"[{timestamp()}] Waiting {settings.interval_minutes} minutes...")
-        _sleep(settings.interval_minutes)
+    for offer in filtered:
+        locale = _client_locale(client, settings)
+        message = _format_offer_message(offer, locale)
+        if bot:
+            safe_send(bot, chat_id, message)
+        else:
+            print(f"[{timestamp()}] {message}")
+        offer_id = offer.get("id")
+        if offer_id:
+            seen_ids.add(offer_id)
+    return len(filtered)
 
 
-def _sleep(minutes: float) -> None:
-    time.sleep(max(minutes, 0.1) * 60)
+class _UnseenCounter:
+    """Client's seen IDs as handed to an agent, counting the unseen IDs it looked up.
+
+    Agents check every fetched item against ``seen_ids`` before their price,
+    keyword and city filters, so the count is how many new items the source
+    returned, which is what adaptive polling needs, not how many were alerted.
+    """
+
+    def __init__(self, seen_ids) -> None:
+        self._seen_ids = seen_ids
+        self._unseen: set = set()
+
+    @property
+    def unseen(self) -> int:
+        return len(self._unseen)
+
+    def __contains__(self, item_id) -> bool:
+        found = item_id in self._seen_ids
+        if not found:
+            self._unseen.add(item_id)
+        return found
+
+    def __iter__(self):
+        return iter(self._seen_ids)
+
+    def __len__(self) -> int:
+        return len(self._seen_ids)
+
+    def __getattr__(self, name):
+        return getattr(self._seen_ids, name)
+
+
+def _seen_for(seen_history: dict, chat_id: str) -> set[str]:
+    if chat_id not in seen_history:
+        seen_history[chat_id] = set()
+    return seen_history[chat_id]
+
+
+def _wait(state: dict, seconds: float) -> None:
+    deadline = time.time() + seconds
+    while state.get("running", True):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, 1.0))
 
 
 def _format_offer_message(offer: dict, locale: str) -> str:
@@ -170,15 +484,6 @@ def _get_lock(state: dict) -> threading.Lock:
     return lock
 
 
-def _needs_browser(clients: list[dict]) -> bool:
-    for client in clients:
-        sources = client.get("sources", {})
-        for agent in AGENTS:
-            if agent.requires_browser and sources.get(agent.name, {}).get("active"):
-                return True
-    return False
-
-
 def _store_offers(state: dict, chat_id: str, offers: list[dict]) -> None:
     if not offers:
         return
@@ -196,6 +501,16 @@ def _set_last_scan(state: dict) -> None:
         state["last_scan_at"] = datetime.datetime.utcnow().isoformat() + "Z"
 
 
+def _set_engine_stats(state: dict, budget, seen_history, browser_pool) -> None:
+    stats = budget.stats()
+    stats["browser"] = browser_pool.stats()
+    if hasattr(seen_history, "stats"):
+        stats["seen_history"] = seen_history.stats()
+    lock = _get_lock(state)
+    with lock:
+        state["engine_stats"] = stats
+
+
 def _client_locale(client: dict, settings) -> str:
     preferred = client.get("locale") if isinstance(client, dict) else None
     return select_locale(preferred, None, getattr(settings, "default_locale", "en"))
@@ -0,0 +1,395 @@
+﻿"""Continuous per-client scan scheduling."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+import heapq
+import random
+import threading
+
+TIERS = ("free", "pro", "vip", "boost")
+
+
+@dataclass(order=True)
+class ScanJob:
+    due: float
+    seq: int
+    chat_id: str = field(compare=False)
+    agent: str = field(compare=False)
+    requires_browser: bool = field(default=False, compare=False)
+    tier: str = field(default="free", compare=False)
+    feed: str = field(default="", compare=False)
+    # Budget units taken when the job was admitted, settled once it has run.
+    charged: float = field(default=0.0, compare=False)
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.chat_id, self.agent)
+
+
+def client_tier(client: dict, now: float) -> str:
+    """Effective tier of a client; an unexpired boost outranks the subscription."""
+    try:
+        if float(client.get("boost_until") or 0) > now:
+            return "boost"
+    except Exception:
+        pass
+    tier = str(client.get("tier") or "free").lower()
+    return tier if tier in TIERS else "free"
+
+
+@dataclass
+class TierPolicy:
+    intervals: dict[str, float]
+    weights: dict[str, float]
+    default_interval: float
+
+    @classmethod
+    def from_settings(cls, settings, default_interval: float) -> "TierPolicy":
+        intervals = {
+            tier: max(float(minutes), 0.1) * 60
+            for tier, minutes in (getattr(settings, "tier_interval_minutes", None) or {}).items()
+        }
+        weights = dict(getattr(settings, "tier_weights", None) or {})
+        return cls(intervals=intervals, weights=weights, default_interval=default_interval)
+
+    def interval_for(self, tier: str) -> float:
+        return self.intervals.get(tier, self.default_interval)
+
+    def weight_for(self, tier: str) -> float:
+        return max(float(self.weights.get(tier, 1.0)), 0.01)
+
+
+class CapacityBudget:
+    """Token bucket refilled continuously at ``per_minute`` units per minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.per_minute = max(float(per_minute or 0), 0.0)
+        self.tokens = self.per_minute
+        self._updated: float | None = None
+
+    @property
+    def unlimited(self) -> bool:
+        return self.per_minute <= 0
+
+    def try_spend(self, amount: float, now: float) -> bool:
+        if self.unlimited:
+            return True
+        self._refill(now)
+        # A single job may cost more than a full bucket (long browser scrapes);
+        # let it through once the bucket is full instead of starving it forever.
+        if self.tokens >= min(amount, self.per_minute):
+            self.tokens -= amount
+            return True
+        return False
+
+    def adjust(self, amount: float, now: float) -> None:
+        """Take (or with a negative amount, return) units after the fact; may go into debt."""
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.tokens = min(self.tokens - amount, self.per_minute)
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.per_minute) - self.tokens
+        return max(missing, 0.0) * 60 / self.per_minute
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            elapsed = max(now - self._updated, 0.0)
+            self.tokens = min(self.tokens + elapsed * self.per_minute / 60, self.per_minute)
+        self._updated = now
+
+
+class RunBudget:
+    """Wall-clock limits for one batch of scans.
+
+    ``cycle_seconds`` caps the whole batch, ``client_seconds`` the time spent on
+    one client's sources and ``agent_seconds`` (per agent name, ``*`` for the
+    rest) a single agent call. Zero disables a limit. Work that would start past
+    a limit is deferred; work that runs past one is counted as an overrun.
+    """
+
+    def __init__(self, cycle_seconds: float = 0.0, client_seconds: float = 0.0, agent_seconds: dict | None = None) -> None:
+        self.cycle_seconds = max(float(cycle_seconds or 0), 0.0)
+        self.client_seconds = max(float(client_seconds or 0), 0.0)
+        self.agent_seconds = dict(agent_seconds or {})
+        self.started = 0.0
+        self._spent: dict[str, float] = {}
+        self.overruns = {"cycle": 0, "client": 0, "agent": 0}
+        self.deferred = 0
+        self.late_results = 0
+
+    @classmethod
+    def from_settings(cls, settings) -> "RunBudget":
+        return cls(
+            cycle_seconds=getattr(settings, "cycle_deadline_seconds", 0.0),
+            client_seconds=getattr(settings, "client_time_budget_seconds", 0.0),
+            agent_seconds=getattr(settings, "agent_time_budgets", None),
+        )
+
+    def start(self, now: float) -> None:
+        self.started = now
+        self._spent = {}
+
+    def agent_limit(self, agent: str) -> float:
+        return max(float(self.agent_seconds.get(agent, self.agent_seconds.get("*", 0.0)) or 0), 0.0)
+
+    def blocked(self, chat_id: str, now: float) -> str | None:
+        """Why a job for ``chat_id`` may not start now, if it may not."""
+        if self.cycle_seconds and now - self.started >= self.cycle_seconds:
+            return "cycle"
+        if self.client_seconds and self._spent.get(chat_id, 0.0) >= self.client_seconds:
+            return "client"
+        return None
+
+    def limit_for(self, chat_id: str, agent: str, started: float) -> tuple[float | None, str]:
+        """Deadline for a job that started at ``started`` and the limit that sets it."""
+        limits = []
+        if self.cycle_seconds:
+            limits.append((self.started + self.cycle_seconds, "cycle"))
+        if self.client_seconds:
+            limits.append((started + self.client_seconds - self._spent.get(chat_id, 0.0), "client"))
+        if self.agent_limit(agent):
+            limits.append((started + self.agent_limit(agent), "agent"))
+        if not limits:
+            return None, ""
+        return min(limits)
+
+    def charge(self, chat_id: str, seconds: float) -> None:
+        self._spent[chat_id] = self._spent.get(chat_id, 0.0) + max(float(seconds), 0.0)
+
+    def overrun(self, reason: str) -> None:
+        self.overruns[reason] = self.overruns.get(reason, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "overruns": dict(self.overruns),
+            "deferred": self.deferred,
+            "late_results": self.late_results,
+        }
+
+
+def feed_key(client: dict, agent_name: str) -> str:
+    source = client.get("sources", {}).get(agent_name) or {}
+    urls = [str(url) for url in source.get("urls") or [] if url] if isinstance(source.get("urls"), list) else []
+    if source.get("url"):
+        urls.append(str(source.get("url")))
+    return "|".join([agent_name, *urls])
+
+
+class FeedActivity:
+    """Scales each feed's poll interval by how often it yields unseen items.
+
+    A poll that returns new items shrinks the feed's factor, an empty poll grows
+    it, so busy searches converge on the lower bound and dead ones back off.
+    """
+
+    SHRINK = 0.75
+    GROW = 1.25
+
+    def __init__(self, min_interval: float, max_interval: float) -> None:
+        self.min_interval = max(float(min_interval), 1.0)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self._factors: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, feed: str, new_items: int) -> None:
+        if not feed:
+            return
+        with self._lock:
+            factor = self._factors.get(feed, 1.0)
+            factor *= self.SHRINK if new_items else self.GROW
+            self._factors[feed] = min(max(factor, 0.05), 20.0)
+
+    def interval_for(self, feed: str, base: float) -> float:
+        with self._lock:
+            factor = self._factors.get(feed, 1.0)
+        # Bounds never override a tier's own interval, only how far we adapt from it.
+        lower = min(self.min_interval, base)
+        upper = max(self.max_interval, base)
+        return min(max(base * factor, lower), upper)
+
+
+class ScanScheduler:
+    """Min-heap of (client, agent) jobs ordered by their next due time.
+
+    With ``spread`` enabled the first scan of each HTTP job is placed at a random
+    offset inside the interval so the fleet is scanned evenly instead of in one
+    burst. Browser jobs stay aligned so they share a single Chromium session.
+
+    With a ``policy`` each job is rescheduled at its tier's interval, and when the
+    request or browser-time budgets are exhausted due jobs are admitted in
+    weighted-fair order across tiers; the rest wait for the budget to refill.
+    HTTP jobs are admitted at the average number of requests a job sends and
+    settled against the requests they actually sent (``record_requests``).
+    An ``activity`` tracker further stretches or shrinks each feed's interval.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float,
+        jitter: float = 0.0,
+        spread: bool = True,
+        policy: TierPolicy | None = None,
+        request_budget: CapacityBudget | None = None,
+        browser_budget: CapacityBudget | None = None,
+        activity: FeedActivity | None = None,
+    ) -> None:
+        self.interval_seconds = max(float(interval_seconds), 1.0)
+        self.jitter = min(max(float(jitter), 0.0), 0.5)
+        self.spread = spread
+        self.policy = policy
+        self.request_budget = request_budget or CapacityBudget(0)
+        self.browser_budget = browser_budget or CapacityBudget(0)
+        self.activity = activity
+        self.browser_cost = 10.0
+        self.request_cost = 1.0
+        self._virtual: dict[str, float] = {}
+        self._heap: list[ScanJob] = []
+        self._jobs: dict[tuple[str, str], ScanJob] = {}
+        self._seq = 0
+        self._primed = False
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def sync(self, clients: list[dict], agents, now: float) -> None:
+        wanted = {}
+        for client in clients:
+            chat_id = str(client.get("chat_id"))
+            sources = client.get("sources", {})
+            tier = client_tier(client, now)
+            for agent in agents:
+                if sources.get(agent.name, {}).get("active"):
+                    wanted[(chat_id, agent.name)] = (agent.requires_browser, tier, feed_key(client, agent.name))
+
+        for key in list(self._jobs):
+            if key not in wanted:
+                del self._jobs[key]
+
+        for key, (requires_browser, tier, feed) in wanted.items():
+            job = self._jobs.get(key)
+            if job is not None:
+                job.feed = feed
+                if job.tier != tier:
+                    job.tier = tier
+                    # An upgrade or boost should not wait out the old, longer interval.
+                    if job.due > now + self._interval_for(tier):
+                        self._push(ScanJob(now, 0, job.chat_id, job.agent, requires_browser, tier, feed))
+                continue
+            offset = 0.0
+            if self.spread and not self._primed and not requires_browser:
+                offset = random.uniform(0, self._interval_for(tier))
+            self._push(ScanJob(now + offset, 0, key[0], key[1], requires_browser, tier, feed))
+
+        self._primed = True
+
+    def has_browser_jobs(self) -> bool:
+        return any(job.requires_browser for job in self._jobs.values())
+
+    def pop_due(self, now: float) -> list[ScanJob]:
+        due = []
+        while self._heap and self._heap[0].due <= now:
+            job = heapq.heappop(self._heap)
+            if self._jobs.get(job.key) is job:
+                due.append(job)
+        if self.request_budget.unlimited and self.browser_budget.unlimited:
+            return due
+        return self._admit(due, now)
+
+    def next_due(self) -> float | None:
+        while self._heap and self._jobs.get(self._heap[0].key) is not self._heap[0]:
+            heapq.heappop(self._heap)
+        return self._heap[0].due if self._heap else None
+
+    def reschedule(self, job: ScanJob, now: float, interval_seconds: float | None = None) -> None:
+        if self._jobs.get(job.key) is not job:
+            return
+        interval = interval_seconds if interval_seconds is not None else self._interval_for(job.tier)
+        if self.activity is not None and not job.requires_browser:
+            interval = self.activity.interval_for(job.feed, interval)
+        if self.jitter and not job.requires_browser:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        self._push(ScanJob(now + interval, 0, job.chat_id, job.agent, job.requires_browser, job.tier, job.feed))
+
+    def result_max_age(self, job: ScanJob) -> float:
+        """Shortest gap between two polls of ``job``, jitter included.
+
+        Cached source results older than this may predate the job's previous
+        poll, so a scheduled poll must not reuse them.
+        """
+        interval = self._interval_for(job.tier)
+        if self.activity is not None and not job.requires_browser:
+            interval = self.activity.interval_for(job.feed, interval)
+        if self.jitter and not job.requires_browser:
+            interval *= 1 - self.jitter
+        return interval
+
+    def defer(self, job: ScanJob, due: float) -> None:
+        """Requeue a job that did not run, keeping its place ahead of fresh work."""
+        if self._jobs.get(job.key) is not job:
+            return
+        self._push(ScanJob(due, 0, job.chat_id, job.agent, job.requires_browser, job.tier, job.feed))
+
+    def record_result(self, job: ScanJob, new_items: int) -> None:
+        if self.activity is not None:
+            self.activity.record(job.feed, new_items)
+
+    def record_requests(self, job: ScanJob, requests: int, now: float) -> None:
+        """Settle an HTTP job's admission charge against the requests it sent."""
+        if job.requires_browser:
+            return
+        self.request_budget.adjust(requests - job.charged, now)
+        job.charged = 0.0
+        if requests:
+            self.request_cost = 0.8 * self.request_cost + 0.2 * requests
+
+    def record_browser_time(self, seconds: float) -> None:
+        self.browser_cost = 0.8 * self.browser_cost + 0.2 * max(float(seconds), 0.0)
+
+    def _interval_for(self, tier: str) -> float:
+        if self.policy is None:
+            return self.interval_seconds
+        return self.policy.interval_for(tier)
+
+    def _admit(self, due: list[ScanJob], now: float) -> list[ScanJob]:
+        queues: dict[str, deque] = {}
+        for job in sorted(due):
+            queues.setdefault(job.tier, deque()).append(job)
+
+        # Tiers that were idle start at the current minimum so they cannot
+        # claim a backlog of unused share in one burst.
+        floor = min((self._virtual[tier] for tier in queues if tier in self._virtual), default=0.0)
+        for tier in queues:
+            self._virtual[tier] = max(self._virtual.get(tier, floor), floor)
+
+        admitted = []
+        while queues:
+            tier = min(queues, key=lambda name: self._virtual[name])
+            job = queues[tier].popleft()
+            if not queues[tier]:
+                del queues[tier]
+
+            budget = self.browser_budget if job.requires_browser else self.request_budget
+            cost = self.browser_cost if job.requires_browser else self.request_cost
+            if not budget.try_spend(cost, now):
+                job.due = now + max(budget.wait_time(cost, now), 1.0)
+                self._push(job)
+                continue
+
+            job.charged = 0.0 if budget.unlimited else cost
+            admitted.append(job)
+            share = cost / budget.per_minute if not budget.unlimited else 0.0
+            weight = self.policy.weight_for(tier) if self.policy else 1.0
+            self._virtual[tier] += share / weight
+        return admitted
+
+    def _push(self, job: ScanJob) -> None:
+        self._seq += 1
+        job.seq = self._seq
+        self._jobs[job.key] = job
+        heapq.heappush(self._heap, job)
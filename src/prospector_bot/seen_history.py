@@ -0,0 +1,491 @@
+﻿"""Seen-item history stores behind the ``load_seen_history`` facade."""
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+import bisect
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Retention is enforced at most this often, on flush.
+PRUNE_INTERVAL_SECONDS = 600.0
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter; ``False`` from ``in`` means definitely absent."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(int(capacity), 1)
+        error_rate = min(max(float(error_rate), 1e-6), 0.5)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hashes))
+
+
+class SeenIds:
+    """Set-like view of one client's seen item IDs (``in``, ``add``, ``len``)."""
+
+    def __init__(self, history: "SeenHistory", chat_id: str) -> None:
+        self._history = history
+        self.chat_id = chat_id
+
+    def __contains__(self, item_id) -> bool:
+        return self._history.contains(self.chat_id, str(item_id))
+
+    def __len__(self) -> int:
+        return self._history.count(self.chat_id)
+
+    def add(self, item_id) -> None:
+        self._history.add(self.chat_id, str(item_id))
+
+    def update(self, item_ids) -> None:
+        for item_id in item_ids:
+            self.add(item_id)
+
+    def recent(self, prefix: str = "", limit: int = 500) -> list[str]:
+        """Most recently seen IDs starting with ``prefix``, newest first."""
+        return self._history.recent(self.chat_id, prefix, limit)
+
+    def touch(self, item_ids) -> None:
+        """Mark stored IDs as seen again without looking them up; unknown IDs are ignored."""
+        self._history.touch(self.chat_id, [str(item_id) for item_id in item_ids])
+
+
+class SeenHistory:
+    """Mapping of ``chat_id`` to :class:`SeenIds` backed by a persistent store.
+
+    Supports the subset of ``dict[str, set[str]]`` the engine uses, so it can
+    replace the in-memory JSON history. New IDs are buffered and written in one
+    batch by ``flush()``; lookups check the buffer, then the store.
+
+    Each client keeps at most ``max_per_client`` IDs, none last seen longer than
+    ``max_age_seconds`` ago (zero disables either limit). A lookup that finds an
+    ID refreshes its last-seen time, as does ``touch()`` for IDs an agent skipped
+    without a lookup, so listings still showing up in results are never evicted
+    and alerted again. With ``bloom_error_rate``
+    set, a per-client Bloom filter sized for ``max_per_client`` answers most
+    misses without touching the store.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_age_seconds: float = 0.0,
+        max_per_client: int = 0,
+        bloom_error_rate: float = 0.0,
+    ) -> None:
+        self.backend = backend
+        self.max_age_seconds = max(float(max_age_seconds or 0), 0.0)
+        self.max_per_client = max(int(max_per_client or 0), 0)
+        self.bloom_error_rate = max(float(bloom_error_rate or 0), 0.0)
+        self._views: dict[str, SeenIds] = {}
+        self._pending: dict[str, dict[str, float]] = {}
+        self._touched: dict[str, dict[str, float]] = {}
+        self._blooms: dict[str, BloomFilter] = {}
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        self.bloom_skips = 0
+        self.evicted = 0
+
+    def __contains__(self, chat_id) -> bool:
+        return str(chat_id) in self._views
+
+    def __getitem__(self, chat_id) -> SeenIds:
+        chat_id = str(chat_id)
+        with self._lock:
+            view = self._views.get(chat_id)
+            if view is None:
+                view = SeenIds(self, chat_id)
+                self._views[chat_id] = view
+            return view
+
+    def __setitem__(self, chat_id, item_ids) -> None:
+        self[chat_id].update(item_ids or ())
+
+    def contains(self, chat_id: str, item_id: str) -> bool:
+        with self._lock:
+            if item_id in self._pending.get(chat_id, ()):
+                return True
+        bloom = self._bloom_for(chat_id)
+        if bloom is not None and item_id not in bloom:
+            self.bloom_skips += 1
+            return False
+        found = self.backend.contains(chat_id, item_id)
+        if found:
+            self.touch(chat_id, [item_id])
+        return found
+
+    def touch(self, chat_id: str, item_ids: list[str]) -> None:
+        if not item_ids or not (self.max_age_seconds or self.max_per_client):
+            return
+        now = time.time()
+        with self._lock:
+            touched = self._touched.setdefault(chat_id, {})
+            for item_id in item_ids:
+                touched[item_id] = now
+
+    def add(self, chat_id: str, item_id: str) -> None:
+        bloom = self._bloom_for(chat_id)
+        with self._lock:
+            self._pending.setdefault(chat_id, {}).setdefault(item_id, time.time())
+            if bloom is not None:
+                bloom.add(item_id)
+
+    def count(self, chat_id: str) -> int:
+        with self._lock:
+            pending = len(self._pending.get(chat_id, ()))
+        return self.backend.count(chat_id) + pending
+
+    def recent(self, chat_id: str, prefix: str = "", limit: int = 500) -> list[str]:
+        with self._lock:
+            pending = sorted(self._pending.get(chat_id, {}).items(), key=lambda entry: entry[1], reverse=True)
+        newest = [item_id for item_id, _ in pending if item_id.startswith(prefix)][:limit]
+        if len(newest) >= limit:
+            return newest
+        return newest + self.backend.recent(chat_id, prefix, limit - len(newest))
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        rows = [(chat_id, item_id, seen_at) for chat_id, items in pending.items() for item_id, seen_at in items.items()]
+        if rows:
+            self.backend.add_many(rows)
+        refreshed = [(chat_id, item_id, seen_at) for chat_id, items in touched.items() for item_id, seen_at in items.items()]
+        if refreshed:
+            self.backend.touch_many(refreshed)
+        if time.time() - self._pruned_at >= PRUNE_INTERVAL_SECONDS:
+            self.prune()
+        return len(rows)
+
+    def prune(self, now: float | None = None) -> int:
+        """Apply the retention limits; returns the number of IDs evicted."""
+        now = time.time() if now is None else now
+        self._pruned_at = now
+        if not self.max_age_seconds and not self.max_per_client:
+            return 0
+        cutoff = now - self.max_age_seconds if self.max_age_seconds else None
+        evicted, affected = self.backend.evict(cutoff, self.max_per_client)
+        if affected:
+            # Bloom filters cannot forget; rebuild the affected ones on next use.
+            with self._lock:
+                for chat_id in affected:
+                    self._blooms.pop(chat_id, None)
+        self.evicted += evicted
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "blooms": len(self._blooms),
+                "bloom_bytes": sum(len(bloom._bits) for bloom in self._blooms.values()),
+                "bloom_skips": self.bloom_skips,
+                "evicted": self.evicted,
+            }
+
+    def close(self) -> None:
+        self.flush()
+        self.backend.close()
+
+    def _bloom_for(self, chat_id: str) -> BloomFilter | None:
+        if not self.bloom_error_rate:
+            return None
+        with self._lock:
+            bloom = self._blooms.get(chat_id)
+            if bloom is not None:
+                return bloom
+        capacity = self.max_per_client or max(self.backend.count(chat_id) * 2, 1000)
+        bloom = BloomFilter(capacity, self.bloom_error_rate)
+        for item_id in self.backend.iter_ids(chat_id):
+            bloom.add(item_id)
+        with self._lock:
+            for item_id in self._pending.get(chat_id, ()):
+                bloom.add(item_id)
+            return self._blooms.setdefault(chat_id, bloom)
+
+
+class SqliteSeenStore:
+    """``(chat_id, item_id)`` primary-keyed SQLite table in WAL mode."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                " chat_id TEXT NOT NULL,"
+                " item_id TEXT NOT NULL,"
+                " first_seen REAL NOT NULL,"
+                " last_seen REAL NOT NULL,"
+                " PRIMARY KEY (chat_id, item_id)"
+                ") WITHOUT ROWID"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(seen)")}
+            if "last_seen" not in columns:
+                self._conn.execute("ALTER TABLE seen ADD COLUMN last_seen REAL NOT NULL DEFAULT 0")
+                self._conn.execute("UPDATE seen SET last_seen = first_seen")
+            self._conn.execute("DROP INDEX IF EXISTS seen_by_age")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS seen_by_last_seen ON seen (chat_id, last_seen)")
+            self._conn.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM seen LIMIT 1").fetchone() is None
+
+    def contains(self, chat_id: str, item_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM seen WHERE chat_id = ? AND item_id = ?", (chat_id, item_id)
+            ).fetchone()
+        return row is not None
+
+    def count(self, chat_id: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen WHERE chat_id = ?", (chat_id,)).fetchone()[0]
+
+    def recent(self, chat_id: str, prefix: str = "", limit: int = 500) -> list[str]:
+        if limit <= 0:
+            return []
+        # Range on the primary key instead of LIKE, which would not use the index.
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else "\U0010ffff"
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id FROM seen WHERE chat_id = ? AND item_id >= ? AND item_id < ?"
+                " ORDER BY last_seen DESC LIMIT ?",
+                (chat_id, prefix, upper, int(limit)),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_ids(self, chat_id: str):
+        with self._lock:
+            rows = self._conn.execute("SELECT item_id FROM seen WHERE chat_id = ?", (chat_id,)).fetchall()
+        return (row[0] for row in rows)
+
+    def evict(self, cutoff: float | None, max_per_client: int) -> tuple[int, set[str]]:
+        """Delete IDs last seen before ``cutoff`` and all but each client's ``max_per_client`` most recent."""
+        affected = set()
+        evicted = 0
+        with self._lock:
+            with self._conn:
+                if cutoff is not None:
+                    affected.update(
+                        row[0]
+                        for row in self._conn.execute("SELECT DISTINCT chat_id FROM seen WHERE last_seen < ?", (cutoff,))
+                    )
+                    evicted += self._conn.execute("DELETE FROM seen WHERE last_seen < ?", (cutoff,)).rowcount
+                if max_per_client:
+                    over = self._conn.execute(
+                        "SELECT chat_id FROM seen GROUP BY chat_id HAVING COUNT(*) > ?", (max_per_client,)
+                    ).fetchall()
+                    for (chat_id,) in over:
+                        evicted += self._conn.execute(
+                            "DELETE FROM seen WHERE chat_id = ? AND item_id IN ("
+                            " SELECT item_id FROM seen WHERE chat_id = ?"
+                            " ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                            (chat_id, chat_id, max_per_client),
+                        ).rowcount
+                        affected.add(chat_id)
+        return evicted, affected
+
+    def add_many(self, rows: list[tuple[str, str, float]]) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO seen (chat_id, item_id, first_seen, last_seen) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (chat_id, item_id) DO UPDATE SET last_seen = MAX(last_seen, excluded.last_seen)",
+                    ((chat_id, item_id, seen_at, seen_at) for chat_id, item_id, seen_at in rows),
+                )
+
+    def touch_many(self, rows: list[tuple[str, str, float]]) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE seen SET last_seen = MAX(last_seen, ?) WHERE chat_id = ? AND item_id = ?",
+                    ((seen_at, chat_id, item_id) for chat_id, item_id, seen_at in rows),
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MmapSeenStore:
+    """Per-client sorted arrays of 64-bit item-ID hashes, memory-mapped from disk.
+
+    ``<chat_id>.bin`` holds sorted native-endian uint64 hashes and is searched
+    in place with ``bisect`` over a ``memoryview`` (no copy, only touched pages
+    become resident). New hashes go to ``<chat_id>.log`` and an in-memory set
+    until ``merge_threshold`` of them accumulate, then are merged into a new
+    sorted file. Only hashes are stored, so IDs cannot be listed back.
+    """
+
+    def __init__(self, directory: Path, merge_threshold: int = 4096) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.merge_threshold = max(int(merge_threshold), 1)
+        self._clients: dict[str, _HashFile] = {}
+        self._lock = threading.Lock()
+
+    def is_empty(self) -> bool:
+        return not any(self.directory.iterdir())
+
+    def contains(self, chat_id: str, item_id: str) -> bool:
+        return self._client(chat_id).contains(_hash_id(item_id))
+
+    def count(self, chat_id: str) -> int:
+        return len(self._client(chat_id))
+
+    def recent(self, chat_id: str, prefix: str = "", limit: int = 500) -> list[str]:
+        return []
+
+    def iter_ids(self, chat_id: str):
+        return iter(())
+
+    def evict(self, cutoff: float | None, max_per_client: int) -> tuple[int, set[str]]:
+        # Hashes carry no timestamps or order; retention is a SQLite-store feature.
+        return 0, set()
+
+    def touch_many(self, rows: list[tuple[str, str, float]]) -> None:
+        pass
+
+    def add_many(self, rows: list[tuple[str, str, float]]) -> None:
+        grouped: dict[str, list[int]] = {}
+        for chat_id, item_id, _ in rows:
+            grouped.setdefault(chat_id, []).append(_hash_id(item_id))
+        for chat_id, hashes in grouped.items():
+            client = self._client(chat_id)
+            client.append(hashes)
+            if client.buffered >= self.merge_threshold:
+                client.merge()
+
+    def close(self) -> None:
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+
+    def _client(self, chat_id: str) -> "_HashFile":
+        with self._lock:
+            client = self._clients.get(chat_id)
+            if client is None:
+                name = re.sub(r"[^A-Za-z0-9_-]", "_", chat_id) or "_"
+                client = _HashFile(self.directory / name)
+                self._clients[chat_id] = client
+            return client
+
+
+class _HashFile:
+    def __init__(self, stem: Path) -> None:
+        self.sorted_path = stem.with_suffix(".bin")
+        self.log_path = stem.with_suffix(".log")
+        self._buffer: set[int] = set()
+        self._mm = None
+        self._base = None
+        self._view = None
+        self._lock = threading.Lock()
+        self._open()
+        if self.log_path.exists():
+            pending = array("Q")
+            data = self.log_path.read_bytes()
+            pending.frombytes(data[: len(data) - len(data) % pending.itemsize])
+            self._buffer.update(pending)
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return (len(self._view) if self._view is not None else 0) + len(self._buffer)
+
+    def contains(self, value: int) -> bool:
+        with self._lock:
+            if value in self._buffer:
+                return True
+            view = self._view
+            if view is None:
+                return False
+            index = bisect.bisect_left(view, value)
+            return index < len(view) and view[index] == value
+
+    def append(self, hashes: list[int]) -> None:
+        with self._lock:
+            fresh = array("Q", (value for value in set(hashes) if value not in self._buffer))
+            if not fresh:
+                return
+            with self.log_path.open("ab") as handle:
+                handle.write(fresh.tobytes())
+            self._buffer.update(fresh)
+
+    def merge(self) -> None:
+        with self._lock:
+            merged = array("Q")
+            previous = None
+            existing = self._view if self._view is not None else ()
+            for value in heapq.merge(existing, sorted(self._buffer)):
+                if value != previous:
+                    merged.append(value)
+                    previous = value
+            tmp_path = self.sorted_path.with_suffix(".tmp")
+            with tmp_path.open("wb") as handle:
+                merged.tofile(handle)
+                handle.flush()
+                os.fsync(handle.fileno())
+            # Windows cannot replace a file that is still mapped.
+            self._close_map()
+            os.replace(tmp_path, self.sorted_path)
+            self.log_path.unlink(missing_ok=True)
+            self._buffer.clear()
+            self._open()
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_map()
+
+    def _open(self) -> None:
+        if not self.sorted_path.exists() or self.sorted_path.stat().st_size < 8:
+            return
+        with self.sorted_path.open("rb") as handle:
+            self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._base = memoryview(self._mm)
+        self._view = self._base[: len(self._mm) - len(self._mm) % 8].cast("Q")
+
+    def _close_map(self) -> None:
+        # Every view must be released before the map can be closed.
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._base is not None:
+            self._base.release()
+            self._base = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+def _hash_id(item_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(item_id.encode("utf-8"), digest_size=8).digest(), "little")
@@ -36,12 +36,57 @@ def _to_bool(value: str | None, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "y", "on"}
 
 
+def _to_float(value: str | None, default: float, minimum: float | None = None) -> float:
+    try:
+        result = float(value) if value not in (None, "") else default
+    except Exception:
+        result = default
+    if minimum is not None and result < minimum:
+        return minimum
+    return result
+
+
+def _to_int(value: str | None, default: int, minimum: int | None = None) -> int:
+    try:
+        result = int(value) if value not in (None, "") else default
+    except Exception:
+        result = default
+    if minimum is not None and result < minimum:
+        return minimum
+    return result
+
+
+def _to_list(value: str | None, default: list[str]) -> list[str]:
+    if value is None:
+        return list(default)
+    return [item.strip().lower() for item in value.split(",") if item.strip()]
+
+
+def _to_mapping(value: str | None, default: dict[str, float]) -> dict[str, float]:
+    """Parse ``key=number`` pairs (``"vip=0.5,free=5"``) on top of ``default``."""
+    result = dict(default)
+    if not value:
+        return result
+    for pair in value.split(","):
+        if "=" not in pair:
+            continue
+        key, raw = pair.split("=", 1)
+        key = key.strip().lower()
+        try:
+            result[key] = float(raw.strip())
+        except Exception:
+            continue
+    return result
+
+
 @dataclass
 class Settings:
     base_dir: Path
     data_dir: Path
     session_dir: Path
     history_path: Path
+    seen_history_db_path: Path
+    seen_history_hash_dir: Path
     preferences_path: Path
     telegram_token: str
     gemini_api_key: str
@@ -56,6 +101,40 @@ class Settings:
     ebay_global_id: str
     ebay_currency: str
     default_locale: str
+    preferences_compact_every: int
+    seen_history_backend: str
+    seen_history_max_age_days: float
+    seen_history_max_per_client: int
+    seen_bloom_error_rate: float
+    scan_workers: int
+    scheduler_mode: str
+    scan_jitter: float
+    tier_interval_minutes: dict[str, float]
+    tier_weights: dict[str, float]
+    request_budget_per_minute: float
+    browser_seconds_per_minute: float
+    adaptive_polling: bool
+    min_interval_minutes: float
+    max_interval_minutes: float
+    domain_rate_limits: str
+    http_pool_size: int
+    http_timeout: float
+    http_retries: int
+    hedge_requests: bool
+    cycle_deadline_seconds: float
+    client_time_budget_seconds: float
+    agent_time_budgets: dict[str, float]
+    circuit_failure_threshold: int
+    circuit_open_seconds: float
+    browser_max_pages: int
+    browser_max_age_minutes: float
+    browser_max_rss_mb: float
+    browser_max_tabs: int
+    browser_block_resources: list[str]
+    browser_block_hosts: list[str]
+    response_cache_ttls: dict[str, float]
+    response_cache_size: int
+    response_cache_disk: bool
 
 
 def load_settings() -> Settings:
@@ -65,6 +144,8 @@ def load_settings() -> Settings:
     data_dir = Path(os.getenv("DATA_DIR") or base_dir / "data")
     session_dir = Path(os.getenv("SESSION_DIR") or data_dir / "browser_session")
     history_path = Path(os.getenv("SEEN_HISTORY_PATH") or data_dir / "seen_history.json")
+    seen_history_db_path = Path(os.getenv("SEEN_HISTORY_DB") or data_dir / "seen_history.sqlite3")
+    seen_history_hash_dir = Path(os.getenv("SEEN_HISTORY_HASH_DIR") or data_dir / "seen_hashes")
     preferences_path = Path(os.getenv("USER_PREFERENCES_PATH") or data_dir / "user_preferences.json")
 
     telegram_token = os.getenv("TELEGRAM_TOKEN") or ""
@@ -95,12 +176,66 @@ def load_settings() -> Settings:
     ebay_global_id = os.getenv("EBAY_GLOBAL_ID") or "EBAY-US"
     ebay_currency = os.getenv("EBAY_CURRENCY") or "USD"
     default_locale = os.getenv("DEFAULT_LOCALE") or os.getenv("BOT_LOCALE") or "en"
+    preferences_compact_every = _to_int(os.getenv("PREFERENCES_COMPACT_EVERY"), default=200, minimum=1)
+    seen_history_backend = (os.getenv("SEEN_HISTORY_BACKEND") or "sqlite").strip().lower()
+    seen_history_max_age_days = _to_float(os.getenv("SEEN_HISTORY_MAX_AGE_DAYS"), default=30.0, minimum=0.0)
+    seen_history_max_per_client = _to_int(os.getenv("SEEN_HISTORY_MAX_PER_CLIENT"), default=5000, minimum=0)
+    seen_bloom_error_rate = _to_float(os.getenv("SEEN_BLOOM_ERROR_RATE"), default=0.01, minimum=0.0)
+    scan_workers = _to_int(os.getenv("SCAN_WORKERS"), default=4, minimum=1)
+    scheduler_mode = (os.getenv("SCHEDULER_MODE") or "continuous").strip().lower()
+    scan_jitter = _to_float(os.getenv("SCAN_JITTER"), default=0.1, minimum=0.0)
+    tier_interval_minutes = _to_mapping(
+        os.getenv("TIER_INTERVAL_MINUTES"),
+        {"free": interval_minutes, "pro": interval_minutes / 2, "vip": 0.5, "boost": 0.5},
+    )
+    tier_weights = _to_mapping(os.getenv("TIER_WEIGHTS"), {"free": 1.0, "pro": 3.0, "vip": 8.0, "boost": 8.0})
+    request_budget_per_minute = _to_float(os.getenv("SCAN_REQUEST_BUDGET"), default=0.0, minimum=0.0)
+    browser_seconds_per_minute = _to_float(os.getenv("BROWSER_SECONDS_BUDGET"), default=0.0, minimum=0.0)
+    adaptive_polling = _to_bool(os.getenv("ADAPTIVE_POLLING"), default=True)
+    min_interval_minutes = _to_float(os.getenv("MIN_INTERVAL_MINUTES"), default=1.0, minimum=0.1)
+    max_interval_minutes = _to_float(
+        os.getenv("MAX_INTERVAL_MINUTES"), default=interval_minutes * 6, minimum=min_interval_minutes
+    )
+    domain_rate_limits = os.getenv("DOMAIN_RATE_LIMITS") or ""
+    http_pool_size = _to_int(os.getenv("HTTP_POOL_SIZE"), default=4, minimum=1)
+    http_timeout = _to_float(os.getenv("HTTP_TIMEOUT"), default=20.0, minimum=1.0)
+    http_retries = _to_int(os.getenv("HTTP_RETRIES"), default=2, minimum=0)
+    hedge_requests = _to_bool(os.getenv("HEDGE_REQUESTS"), default=False)
+    cycle_deadline_seconds = _to_float(os.getenv("CYCLE_DEADLINE_SECONDS"), default=120.0, minimum=0.0)
+    client_time_budget_seconds = _to_float(os.getenv("CLIENT_TIME_BUDGET_SECONDS"), default=90.0, minimum=0.0)
+    agent_time_budgets = _to_mapping(os.getenv("AGENT_TIME_BUDGETS"), {"facebook": 60.0, "*": 30.0})
+    circuit_failure_threshold = _to_int(os.getenv("CIRCUIT_FAILURE_THRESHOLD"), default=3, minimum=1)
+    circuit_open_seconds = _to_float(os.getenv("CIRCUIT_OPEN_SECONDS"), default=60.0, minimum=1.0)
+    browser_max_pages = _to_int(os.getenv("BROWSER_MAX_PAGES"), default=200, minimum=0)
+    browser_max_age_minutes = _to_float(os.getenv("BROWSER_MAX_AGE_MINUTES"), default=60.0, minimum=0.0)
+    browser_max_rss_mb = _to_float(os.getenv("BROWSER_MAX_RSS_MB"), default=600.0, minimum=0.0)
+    browser_max_tabs = _to_int(os.getenv("BROWSER_MAX_TABS"), default=3, minimum=1)
+    browser_block_resources = _to_list(os.getenv("BROWSER_BLOCK_RESOURCES"), ["image", "media", "font"])
+    browser_block_hosts = _to_list(
+        os.getenv("BROWSER_BLOCK_HOSTS"),
+        [
+            "doubleclick.net",
+            "google-analytics.com",
+            "googletagmanager.com",
+            "googlesyndication.com",
+            "adservice.google.com",
+            "scorecardresearch.com",
+            "hotjar.com",
+        ],
+    )
+    response_cache_ttls = _to_mapping(
+        os.getenv("RESPONSE_CACHE_TTLS"), {"rss": 120.0, "ebay": 300.0, "*": 60.0}
+    )
+    response_cache_size = _to_int(os.getenv("RESPONSE_CACHE_SIZE"), default=256, minimum=1)
+    response_cache_disk = _to_bool(os.getenv("RESPONSE_CACHE_DISK"), default=False)
 
     return Settings(
         base_dir=base_dir,
         data_dir=data_dir,
         session_dir=session_dir,
         history_path=history_path,
+        seen_history_db_path=seen_history_db_path,
+        seen_history_hash_dir=seen_history_hash_dir,
         preferences_path=preferences_path,
         telegram_token=telegram_token,
         gemini_api_key=gemini_api_key,
@@ -115,5 +250,39 @@ def load_settings() -> Settings:
         ebay_global_id=ebay_global_id,
         ebay_currency=ebay_currency,
         default_locale=default_locale,
+        preferences_compact_every=preferences_compact_every,
+        seen_history_backend=seen_history_backend,
+        seen_history_max_age_days=seen_history_max_age_days,
+        seen_history_max_per_client=seen_history_max_per_client,
+        seen_bloom_error_rate=seen_bloom_error_rate,
+        scan_workers=scan_workers,
+        scheduler_mode=scheduler_mode,
+        scan_jitter=scan_jitter,
+        tier_interval_minutes=tier_interval_minutes,
+        tier_weights=tier_weights,
+        request_budget_per_minute=request_budget_per_minute,
+        browser_seconds_per_minute=browser_seconds_per_minute,
+        adaptive_polling=adaptive_polling,
+        min_interval_minutes=min_interval_minutes,
+        max_interval_minutes=max_interval_minutes,
+        domain_rate_limits=domain_rate_limits,
+        http_pool_size=http_pool_size,
+        http_timeout=http_timeout,
+        http_retries=http_retries,
+        hedge_requests=hedge_requests,
+        cycle_deadline_seconds=cycle_deadline_seconds,
+        client_time_budget_seconds=client_time_budget_seconds,
+        agent_time_budgets=agent_time_budgets,
+        circuit_failure_threshold=circuit_failure_threshold,
+        circuit_open_seconds=circuit_open_seconds,
+        browser_max_pages=browser_max_pages,
+        browser_max_age_minutes=browser_max_age_minutes,
+        browser_max_rss_mb=browser_max_rss_mb,
+        browser_max_tabs=browser_max_tabs,
+        browser_block_resources=browser_block_resources,
+        browser_block_hosts=browser_block_hosts,
+        response_cache_ttls=response_cache_ttls,
+        response_cache_size=response_cache_size,
+        response_cache_disk=response_cache_disk,
     )
 
@@ -26,10 +26,13 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 import json
+import os
 import shutil
+import threading
 import time
 
 from .i18n import normalize_locale
+from .seen_history import MmapSeenStore, SeenHistory, SqliteSeenStore
 from .settings import Settings
 from .utils import (
     build_craigslist_url,
@@ -37,6 +40,7 @@ from .utils import (
     build_facebook_url,
     build_mercado_livre_url,
     build_olx_url,
+    timestamp,
 )
 
 
@@ -57,9 +61,15 @@ def read_json(path: Path, default):
 
 
 def write_json(path: Path, data) -> None:
+    # Write a sibling temp file and rename it over the target, so a crash leaves
+    # either the old or the new file, never a truncated one.
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
         json.dump(data, handle, indent=4, ensure_ascii=False)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
 
 
 def _backup_corrupt_file(path: Path) -> None:
@@ -183,6 +193,8 @@ def normalize_client(raw: dict) -> dict:
         locale = normalize_locale(locale, "en")
 
     negative_keywords = raw.get("negative_keywords") or raw.get("palavras_negativas") or []
+    tier = str(raw.get("tier") or raw.get("plan") or "free").strip().lower()
+    boost_until = _to_float(raw.get("boost_until"), 0.0)
 
     sources_raw = raw.get("sources") or raw.get("fontes") or {}
     sources = _ensure_source_urls(sources_raw, search_term, price_min, price_max, target_city)
@@ -200,6 +212,8 @@ def normalize_client(raw: dict) -> dict:
         "negative_keywords": list(negative_keywords) if isinstance(negative_keywords, list) else [],
         "sources": sources,
         "locale": locale,
+        "tier": tier,
+        "boost_until": boost_until,
     }
 
 
@@ -233,22 +247,166 @@ def upsert_client(clients: list[dict], new_client: dict) -> list[dict]:
     return clients
 
 
+class PreferenceJournal:
+    """Append-only change log in front of the preferences snapshot.
+
+    Each change is one JSON line (``upsert`` with the full client record, or
+    ``delete``), so recording it is an O(1) append. Loading replays the journal
+    over the snapshot. Every ``compact_every`` entries a background thread
+    rotates the journal aside, folds it into a new snapshot and drops it;
+    replaying an entry twice is harmless, so a crash mid-compaction loses nothing.
+    """
+
+    def __init__(self, snapshot_path: Path, compact_every: int = 200) -> None:
+        self.snapshot_path = Path(snapshot_path)
+        self.path = self.snapshot_path.with_suffix(self.snapshot_path.suffix + ".journal")
+        self.rotated_path = self.path.with_suffix(self.path.suffix + ".1")
+        self.compact_every = max(int(compact_every), 1)
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._entries = sum(1 for _ in _read_journal(self.path))
+        self._compacting = False
+        # A crash mid-append leaves a torn last line; start the next entry on a fresh one.
+        self._torn = _has_torn_tail(self.path)
+
+    def append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._torn:
+                line = "\n" + line
+                self._torn = False
+            with self.path.open("a", encoding="utf-8") as handle:
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._entries += 1
+            if self._entries < self.compact_every or self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, name="prospector-compact", daemon=True).start()
+
+    def load(self) -> list[dict]:
+        with self._snapshot_lock:
+            clients = _read_snapshot(self.snapshot_path)
+            for path in (self.rotated_path, self.path):
+                for entry in _read_journal(path):
+                    clients = _apply_change(clients, entry)
+        return clients
+
+    def compact(self) -> None:
+        try:
+            with self._snapshot_lock:
+                with self._lock:
+                    if self.path.exists() and not self.rotated_path.exists():
+                        os.replace(self.path, self.rotated_path)
+                        self._entries = 0
+                clients = _read_snapshot(self.snapshot_path)
+                for entry in _read_journal(self.rotated_path):
+                    clients = _apply_change(clients, entry)
+                write_json(self.snapshot_path, clients)
+                self.rotated_path.unlink(missing_ok=True)
+        except Exception as exc:
+            print(f"[{timestamp()}] Preferences compaction failed: {exc}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def reset(self, clients: list[dict]) -> None:
+        """Replace the snapshot wholesale and discard the journal it supersedes."""
+        with self._snapshot_lock:
+            write_json(self.snapshot_path, clients)
+            with self._lock:
+                self.path.unlink(missing_ok=True)
+                self.rotated_path.unlink(missing_ok=True)
+                self._entries = 0
+
+
+_journals: dict[Path, PreferenceJournal] = {}
+_journals_lock = threading.Lock()
+
+
+def _journal_for(settings: Settings) -> PreferenceJournal:
+    path = Path(settings.preferences_path)
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = PreferenceJournal(path, getattr(settings, "preferences_compact_every", 200))
+            _journals[path] = journal
+        return journal
+
+
+def _read_snapshot(path: Path) -> list[dict]:
+    raw = read_json(path, default=[])
+    if not isinstance(raw, list):
+        return []
+    return [item for item in raw if isinstance(item, dict)]
+
+
+def _read_journal(path: Path):
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except Exception:
+                # A torn final line from a crash mid-append; earlier lines are intact.
+                continue
+            if isinstance(entry, dict):
+                yield entry
+
+
+def _has_torn_tail(path: Path) -> bool:
+    try:
+        with path.open("rb") as handle:
+            handle.seek(-1, os.SEEK_END)
+            return handle.read(1) != b"\n"
+    except Exception:
+        return False
+
+
+def _apply_change(clients: list[dict], entry: dict) -> list[dict]:
+    if entry.get("op") == "upsert" and isinstance(entry.get("client"), dict):
+        client = entry["client"]
+        chat_id = str(client.get("chat_id"))
+        for idx, existing in enumerate(clients):
+            if str(existing.get("chat_id")) == chat_id:
+                clients[idx] = client
+                return clients
+        clients.append(client)
+    elif entry.get("op") == "delete":
+        chat_id = str(entry.get("chat_id"))
+        clients = [client for client in clients if str(client.get("chat_id")) != chat_id]
+    return clients
+
+
 def load_preferences(settings: Settings) -> list[dict]:
     ensure_directories(settings)
-    raw = read_json(settings.preferences_path, default=[])
-    if not isinstance(raw, list):
-        raw = []
+    raw = _journal_for(settings).load()
     normalized = [normalize_client(item) for item in raw if isinstance(item, dict)]
     return normalized
 
 
 def save_preferences(settings: Settings, clients: list[dict]) -> None:
+    """Write a full snapshot; prefer ``record_client_change`` for single edits."""
     normalized = [normalize_client(client) for client in clients]
-    write_json(settings.preferences_path, normalized)
+    _journal_for(settings).reset(normalized)
+
+
+def record_client_change(settings: Settings, client: dict) -> None:
+    _journal_for(settings).append({"op": "upsert", "client": normalize_client(client)})
+
+
+def record_client_removal(settings: Settings, chat_id: str) -> None:
+    _journal_for(settings).append({"op": "delete", "chat_id": str(chat_id)})
 
 
 def load_seen_history(settings: Settings) -> dict[str, set[str]]:
     ensure_directories(settings)
+    backend = getattr(settings, "seen_history_backend", "json")
+    if backend in {"sqlite", "mmap"}:
+        return _open_store_history(settings, backend)
     raw = read_json(settings.history_path, default={})
     if not isinstance(raw, dict):
         return {}
@@ -256,10 +414,43 @@ def load_seen_history(settings: Settings) -> dict[str, set[str]]:
 
 
 def save_seen_history(settings: Settings, seen_history: dict[str, set[str]]) -> None:
+    if isinstance(seen_history, SeenHistory):
+        # Store-backed: only this cycle's new IDs are written, in one batch.
+        seen_history.flush()
+        return
     serializable = {key: list(value) for key, value in seen_history.items()}
     write_json(settings.history_path, serializable)
 
 
+def close_seen_history(seen_history) -> None:
+    if isinstance(seen_history, SeenHistory):
+        seen_history.close()
+
+
+def _open_store_history(settings: Settings, backend: str) -> SeenHistory:
+    if backend == "mmap":
+        # Hash files are already compact and binary-searched: no Bloom filter or
+        # timestamps, so the retention limits do not apply.
+        history = SeenHistory(MmapSeenStore(settings.seen_history_hash_dir))
+    else:
+        history = SeenHistory(
+            SqliteSeenStore(settings.seen_history_db_path),
+            max_age_seconds=getattr(settings, "seen_history_max_age_days", 0) * 86400,
+            max_per_client=getattr(settings, "seen_history_max_per_client", 0),
+            bloom_error_rate=getattr(settings, "seen_bloom_error_rate", 0.0),
+        )
+    if history.backend.is_empty() and settings.history_path.exists():
+        # One-time import of the legacy JSON history; the JSON file is left in place.
+        raw = read_json(settings.history_path, default={})
+        if isinstance(raw, dict):
+            for key, value in raw.items():
+                if isinstance(value, list):
+                    history[str(key)] = value
+            history.flush()
+    history.prune()
+    return history
+
+
 def create_client_from_request(chat_id: str, name: str, request: dict, locale: str | None = None) -> dict:
     search_term = request.get("product", "")
     price_max = request.get("max_price", 0)
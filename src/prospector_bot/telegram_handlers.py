@@ -28,7 +28,7 @@ import threading
 from telebot import TeleBot
 
 from .i18n import SUPPORTED_LOCALES, language_name, resolve_locale, select_locale, t
-from .storage import create_client_from_request, save_preferences, upsert_client
+from .storage import create_client_from_request, record_client_change, upsert_client
 from .utils import timestamp
 
 
@@ -84,7 +84,7 @@ def register_handlers(bot: TeleBot, state: dict, ai_client, settings) -> None:
                 pending_locales = state.get("pending_locales", {})
                 if chat_id in pending_locales:
                     pending_locales.pop(chat_id, None)
-                save_preferences(settings, state["clients"])
+                record_client_change(settings, _find_client(state["clients"], chat_id) or new_client)
 
             confirmation = t(
                 locale,
@@ -128,7 +128,7 @@ def _set_client_active(state: dict, settings, client: dict, active: bool) -> Non
     lock = _get_lock(state)
     with lock:
         client["active"] = active
-        save_preferences(settings, state.get("clients", []))
+        record_client_change(settings, client)
 
 
 def _resolve_locale(settings, state: dict, message, chat_id: str, client: dict | None) -> str:
@@ -141,7 +141,7 @@ def _resolve_locale(settings, state: dict, message, chat_id: str, client: dict |
         lock = _get_lock(state)
         with lock:
             client["locale"] = locale
-            save_preferences(settings, state.get("clients", []))
+            record_client_change(settings, client)
     elif client is None and pending != locale:
         lock = _get_lock(state)
         with lock:
@@ -181,7 +181,7 @@ def _handle_language_command(
             pending_locales[chat_id] = normalized
         else:
             client["locale"] = normalized
-            save_preferences(settings, state.get("clients", []))
+            record_client_change(settings, client)
 
     locale_name = language_name(normalized) or normalized
     _safe_reply(bot, message, t(normalized, "lang_updated", locale=locale_name))
@@ -0,0 +1,180 @@
+﻿"""Cross-cycle response cache for HTTP sources."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Seconds a fetched result stays fresh, per source; ``*`` applies to the rest.
+DEFAULT_CACHE_TTLS = {"rss": 120.0, "ebay": 300.0, "*": 60.0}
+
+
+class ResponseCache:
+    """TTL cache with an in-memory LRU and an optional JSON-on-disk tier.
+
+    Entries are keyed by ``(source, key)`` and expire after the source's TTL.
+    Empty or ``None`` results are never stored so a failed fetch is retried on
+    the next scan. The disk tier lets a restarted engine reuse recent results.
+    A caller passing ``max_age`` only accepts entries fetched that recently,
+    even when the source's TTL is longer.
+    """
+
+    def __init__(self, ttls: dict[str, float] | None = None, max_entries: int = 256, disk_dir: Path | None = None) -> None:
+        self.ttls = dict(DEFAULT_CACHE_TTLS if ttls is None else ttls)
+        self.max_entries = max(int(max_entries), 1)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._prune_disk()
+
+    def ttl_for(self, source: str) -> float:
+        return float(self.ttls.get(source, self.ttls.get("*", 0.0)))
+
+    def fetch(self, source: str, key, loader: Callable, max_age: float | None = None):
+        ttl = self.ttl_for(source)
+        if ttl <= 0:
+            return loader()
+
+        cache_key = (source, str(key))
+        now = time.time()
+        # Entries expire at fetch time + TTL; a shorter max_age moves that earlier.
+        fresh_after = now + (ttl - min(ttl, max(float(max_age), 0.0)) if max_age is not None else 0.0)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] > fresh_after:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+
+        entry = self._read_disk(cache_key, now)
+        if entry is not None and entry[0] > fresh_after:
+            with self._lock:
+                self.disk_hits += 1
+                self._put(cache_key, entry)
+            return entry[1]
+
+        with self._lock:
+            self.misses += 1
+        value = loader()
+        if value:
+            entry = (now + ttl, value)
+            with self._lock:
+                self.stores += 1
+                self._put(cache_key, entry)
+            self._write_disk(cache_key, entry)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, cache_key, entry) -> None:
+        self._entries[cache_key] = entry
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, cache_key) -> Path | None:
+        if self.disk_dir is None:
+            return None
+        digest = hashlib.sha1("\x00".join(cache_key).encode("utf-8")).hexdigest()
+        return self.disk_dir / f"{cache_key[0]}_{digest}.json"
+
+    def _prune_disk(self) -> None:
+        if self.disk_dir is None or not self.disk_dir.exists():
+            return
+        now = time.time()
+        for path in self.disk_dir.glob("*.json"):
+            self._read_disk_path(path, now)
+
+    def _read_disk(self, cache_key, now: float):
+        path = self._disk_path(cache_key)
+        if path is None or not path.exists():
+            return None
+        return self._read_disk_path(path, now)
+
+    def _read_disk_path(self, path: Path, now: float):
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            expires = float(payload.get("expires") or 0)
+        except Exception:
+            return None
+        if expires <= now:
+            try:
+                path.unlink()
+            except Exception:
+                pass
+            return None
+        return (expires, payload.get("value"))
+
+    def _write_disk(self, cache_key, entry) -> None:
+        path = self._disk_path(cache_key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps({"expires": entry[0], "value": entry[1]}), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except Exception:
+            pass
+
+
+_cache = ResponseCache(ttls={})
+
+
+def configure_cache(settings) -> ResponseCache:
+    global _cache
+    disk_dir = None
+    if getattr(settings, "response_cache_disk", False):
+        disk_dir = Path(settings.data_dir) / "cache"
+    _cache = ResponseCache(
+        ttls=getattr(settings, "response_cache_ttls", None),
+        max_entries=getattr(settings, "response_cache_size", 256),
+        disk_dir=disk_dir,
+    )
+    return _cache
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
+_local = threading.local()
+
+
+@contextmanager
+def cache_max_age(seconds: float | None):
+    """Limit how old a cached result ``cached()`` may return on this thread."""
+    previous = getattr(_local, "max_age", None)
+    _local.max_age = seconds
+    try:
+        yield
+    finally:
+        _local.max_age = previous
+
+
+def cached(source: str, key, loader: Callable):
+    return _cache.fetch(source, key, loader, max_age=getattr(_local, "max_age", None))
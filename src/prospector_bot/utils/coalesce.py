@@ -0,0 +1,75 @@
+﻿"""Per-cycle request coalescing for shared source queries."""
+from __future__ import annotations
+
+from typing import Callable
+import threading
+
+
+class RequestCoalescer:
+    """Fetches each key once per cycle and shares the result with every caller."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._results: dict = {}
+        self._inflight: dict = {}
+        self.requests = 0
+        self.fetches = 0
+
+    def fetch(self, key, loader: Callable):
+        with self._lock:
+            self.requests += 1
+            if key in self._results:
+                return self._results[key]
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = threading.Event()
+                self._inflight[key] = event
+                self.fetches += 1
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                if key in self._results:
+                    return self._results[key]
+            return loader()
+
+        try:
+            result = loader()
+            with self._lock:
+                self._results[key] = result
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "fetches": self.fetches,
+                "coalesced": self.requests - self.fetches,
+            }
+
+
+_active: RequestCoalescer | None = None
+
+
+def start_cycle() -> RequestCoalescer:
+    global _active
+    _active = RequestCoalescer()
+    return _active
+
+
+def end_cycle() -> dict:
+    global _active
+    coalescer, _active = _active, None
+    return coalescer.stats() if coalescer else {}
+
+
+def coalesced(key, loader: Callable):
+    coalescer = _active
+    if coalescer is None:
+        return loader()
+    return coalescer.fetch(key, loader)
@@ -0,0 +1,107 @@
+﻿"""Per-host failure tracking for the shared HTTP client."""
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+import threading
+import time
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of contacting a host whose circuit is open."""
+
+
+@dataclass
+class _Circuit:
+    failures: int = 0
+    opened_at: float = 0.0
+    open_for: float = 0.0
+    probing: bool = False
+    trips: int = 0
+
+
+class HostHealth:
+    """Circuit breaker per host.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and calls
+    fail fast for ``open_seconds``. Then a single probe is let through: success
+    closes the circuit, failure reopens it for twice as long (up to
+    ``max_open_seconds``).
+    """
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 60.0, max_open_seconds: float = 600.0) -> None:
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.open_seconds = max(float(open_seconds), 1.0)
+        self.max_open_seconds = max(float(max_open_seconds), self.open_seconds)
+        self._circuits: dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or not circuit.open_for:
+                return True
+            if circuit.probing or time.monotonic() - circuit.opened_at < circuit.open_for:
+                self.rejected += 1
+                return False
+            circuit.probing = True
+            return True
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            self._circuits.pop(host, None)
+
+    def failure(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _Circuit())
+            circuit.failures += 1
+            if circuit.probing:
+                self._open(circuit, min(circuit.open_for * 2, self.max_open_seconds))
+            elif not circuit.open_for and circuit.failures >= self.failure_threshold:
+                self._open(circuit, self.open_seconds)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "state": "open" if circuit.open_for else "degraded",
+                    "failures": circuit.failures,
+                    "trips": circuit.trips,
+                    "retry_in": round(max(circuit.opened_at + circuit.open_for - now, 0.0), 1) if circuit.open_for else 0.0,
+                }
+                for host, circuit in self._circuits.items()
+            }
+
+    def _open(self, circuit: _Circuit, seconds: float) -> None:
+        circuit.opened_at = time.monotonic()
+        circuit.open_for = seconds
+        circuit.probing = False
+        circuit.trips += 1
+
+
+class LatencyTracker:
+    """Rolling time-to-first-byte samples per host."""
+
+    def __init__(self, window: int = 100, min_samples: int = 20) -> None:
+        self.window = max(int(window), 1)
+        self.min_samples = max(int(min_samples), 1)
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, host: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(host)
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self._samples[host] = samples
+            samples.append(float(seconds))
+
+    def percentile(self, host: str, fraction: float = 0.95) -> float | None:
+        """``None`` until the host has enough samples to trust the estimate."""
+        with self._lock:
+            samples = sorted(self._samples.get(host) or ())
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(len(samples) * fraction), len(samples) - 1)]
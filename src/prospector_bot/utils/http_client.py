@@ -0,0 +1,489 @@
+﻿"""Shared keep-alive HTTP client for the non-browser agents."""
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urljoin, urlsplit
+import contextvars
+import http.client
+import queue
+import random
+import ssl
+import threading
+import time
+import zlib
+
+try:
+    import brotli
+except Exception:  # pragma: no cover - optional dependency
+    brotli = None
+
+from .health import CircuitOpenError, HostHealth, LatencyTracker
+from .ratelimit import domain_slot, try_domain_slot
+
+DEFAULT_USER_AGENT = "ProspectorBot/1.0"
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+RETRY_CODES = {429, 500, 502, 503, 504}
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 8.0
+# Never hedge sooner than this, however fast a host usually answers.
+MIN_HEDGE_DELAY = 0.25
+# Servers typically drop idle keep-alive sockets after 60-120s; don't reuse older ones.
+IDLE_TIMEOUT = 50.0
+# Unread bodies up to this size (304s, error pages) are drained on close so the
+# socket goes back to the pool instead of costing a new handshake.
+DRAIN_LIMIT = 64 * 1024
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli else "gzip, deflate"
+
+
+@dataclass
+class HttpResponse:
+    url: str
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+class HttpClient:
+    """Keeps up to ``pool_size`` idle connections per host for reuse.
+
+    Requests beyond the pool size still run, on a throwaway connection. Every
+    request passes through the per-domain rate limiter. Responses are
+    negotiated compressed and decoded transparently; ``stats()`` reports bytes
+    on the wire versus decoded bytes.
+
+    Connection errors and 429/5xx answers are retried ``retries`` times with
+    jittered exponential backoff; timeouts are not, since each would cost a full
+    ``timeout`` again. Failures feed a per-host circuit breaker so a host that
+    keeps failing is skipped immediately with ``CircuitOpenError``.
+
+    With ``hedging`` enabled, a ``hedge=True`` request that has not answered by
+    the host's p95 time-to-first-byte gets a second identical request, sent only
+    if the domain limiter has a slot free right now; the first answer wins.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 4,
+        timeout: float = 20.0,
+        max_redirects: int = 5,
+        retries: int = 2,
+        health: HostHealth | None = None,
+        hedging: bool = False,
+    ) -> None:
+        self.pool_size = max(int(pool_size), 1)
+        self.timeout = float(timeout)
+        self.max_redirects = max_redirects
+        self.retries = max(int(retries), 0)
+        self.health = health or HostHealth()
+        self.hedging = hedging
+        self.latency = LatencyTracker()
+        self._hedge_executor: ThreadPoolExecutor | None = None
+        self._pools: dict[tuple[str, str, int], queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedges_won": 0,
+            "bytes_transferred": 0,
+            "bytes_decoded": 0,
+        }
+
+    def get(self, url: str, headers: dict | None = None, timeout: float | None = None, hedge: bool = False) -> HttpResponse:
+        with self.stream(url, headers=headers, timeout=timeout, hedge=hedge) as stream:
+            body = stream.read()
+            return HttpResponse(url=stream.url, status=stream.status, headers=stream.headers, body=body)
+
+    def stream(
+        self, url: str, headers: dict | None = None, timeout: float | None = None, hedge: bool = False
+    ) -> "HttpStream":
+        """Open ``url`` and return once headers arrive; the body is read lazily.
+
+        Use as a context manager. A fully read body returns its connection to
+        the pool; abandoning it early closes the socket instead.
+        """
+        merged = {"User-Agent": DEFAULT_USER_AGENT, "Accept": "*/*", "Accept-Encoding": ACCEPT_ENCODING}
+        merged.update(headers or {})
+        current = url
+        for attempt in range(self.max_redirects + 1):
+            if hedge and self.hedging:
+                stream = self._open_hedged(current, merged, timeout or self.timeout)
+            else:
+                stream = self._open_with_retry(current, merged, timeout or self.timeout)
+            location = stream.headers.get("location")
+            if stream.status in REDIRECT_CODES and location and attempt < self.max_redirects:
+                stream.read()
+                stream.close()
+                current = urljoin(current, location)
+                continue
+            return stream
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        decoded = stats["bytes_decoded"]
+        stats["compression_savings"] = round(1 - stats["bytes_transferred"] / decoded, 3) if decoded else 0.0
+        stats["circuit_rejections"] = self.health.rejected
+        stats["unhealthy_hosts"] = self.health.snapshot()
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, {}
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for pool in pools.values():
+            while True:
+                try:
+                    conn, _ = pool.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+
+    def _open_hedged(self, url: str, headers: dict, timeout: float) -> "HttpStream":
+        host = (urlsplit(url).hostname or "").lower()
+        delay = self.latency.percentile(host)
+        if delay is None:
+            return self._open_with_retry(url, headers, timeout)
+
+        executor = self._hedging_executor()
+        # Hedge threads run in the caller's context so count_requests() sees them.
+        primary = executor.submit(contextvars.copy_context().run, self._open_with_retry, url, headers, timeout)
+        done, _ = wait([primary], timeout=max(delay, MIN_HEDGE_DELAY))
+        if done:
+            return primary.result()
+
+        release = try_domain_slot(url)
+        if release is None:
+            return primary.result()
+        with self._lock:
+            self._stats["hedges"] += 1
+        backup = executor.submit(contextvars.copy_context().run, self._open_hedge, url, headers, timeout, release)
+
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(_close_unused)
+                if future is backup:
+                    with self._lock:
+                        self._stats["hedges_won"] += 1
+                return future.result()
+        raise error
+
+    def _open_hedge(self, url: str, headers: dict, timeout: float, release) -> "HttpStream":
+        # The hedge already holds a limiter slot and is not retried: the primary
+        # request is still in flight and covers failures.
+        try:
+            stream = self._open(url, headers, timeout)
+        except BaseException:
+            release()
+            raise
+        stream._on_close = release
+        return stream
+
+    def _hedging_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(
+                    max_workers=self.pool_size * 4, thread_name_prefix="prospector-hedge"
+                )
+            return self._hedge_executor
+
+    def _open_with_retry(self, url: str, headers: dict, timeout: float) -> "HttpStream":
+        host = (urlsplit(url).hostname or "").lower()
+        retry = 0
+        while True:
+            if not self.health.allow(host):
+                raise CircuitOpenError(f"circuit open for {host}")
+            if retry:
+                with self._lock:
+                    self._stats["retries"] += 1
+
+            slot = domain_slot(url)
+            slot.__enter__()
+            started = time.monotonic()
+            try:
+                stream = self._open(url, headers, timeout)
+            except TimeoutError:
+                slot.__exit__(None, None, None)
+                self.health.failure(host)
+                raise
+            except (http.client.HTTPException, OSError):
+                slot.__exit__(None, None, None)
+                self.health.failure(host)
+                if retry >= self.retries:
+                    raise
+                time.sleep(_backoff(retry))
+                retry += 1
+                continue
+            except BaseException:
+                slot.__exit__(None, None, None)
+                # Not retryable (bad URL, non-ASCII path...), but still an outcome:
+                # a half-open probe must be settled or the host stays rejected.
+                self.health.failure(host)
+                raise
+            stream._on_close = lambda slot=slot: slot.__exit__(None, None, None)
+
+            if stream.status not in RETRY_CODES:
+                self.health.success(host)
+                self.latency.record(host, time.monotonic() - started)
+                return stream
+            self.health.failure(host)
+            if retry >= self.retries:
+                return stream
+            retry_after = stream.headers.get("retry-after")
+            stream.close()
+            time.sleep(_backoff(retry, retry_after))
+            retry += 1
+
+    def _open(self, url: str, headers: dict, timeout: float) -> "HttpStream":
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower() or "http"
+        host = parts.hostname or ""
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, host, port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        conn, reused = self._acquire(key, timeout)
+        try:
+            conn.request("GET", path, headers=headers)
+            raw = conn.getresponse()
+        except (http.client.HTTPException, ConnectionError, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # The server closed an idle keep-alive socket; retry once on a fresh one.
+            conn = self._new_connection(key, timeout)
+            try:
+                conn.request("GET", path, headers=headers)
+                raw = conn.getresponse()
+            except BaseException:
+                conn.close()
+                raise
+        except BaseException:
+            conn.close()
+            raise
+        return HttpStream(self, key, conn, raw, url)
+
+    def _record(self, transferred: int, decoded: int, request: bool = False) -> None:
+        if request:
+            meter = _request_meter.get()
+            if meter is not None:
+                meter[0] += 1
+        with self._lock:
+            if request:
+                self._stats["requests"] += 1
+            self._stats["bytes_transferred"] += transferred
+            self._stats["bytes_decoded"] += decoded
+
+    def _acquire(self, key: tuple[str, str, int], timeout: float):
+        pool = self._pool_for(key)
+        while True:
+            try:
+                conn, last_used = pool.get_nowait()
+            except queue.Empty:
+                return self._new_connection(key, timeout), False
+            if time.monotonic() - last_used > IDLE_TIMEOUT:
+                conn.close()
+                continue
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+
+    def _release(self, key: tuple[str, str, int], conn) -> None:
+        try:
+            self._pool_for(key).put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            conn.close()
+
+    def _pool_for(self, key: tuple[str, str, int]) -> queue.LifoQueue:
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = queue.LifoQueue(maxsize=self.pool_size)
+                self._pools[key] = pool
+            return pool
+
+    def _new_connection(self, key: tuple[str, str, int], timeout: float):
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+class HttpStream:
+    """Response whose body is decoded incrementally as it is read."""
+
+    def __init__(self, client: HttpClient, key: tuple[str, str, int], conn, raw, url: str) -> None:
+        self.url = url
+        self.status = raw.status
+        self.headers = {name.lower(): value for name, value in raw.getheaders()}
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._raw = raw
+        self._decoder = _Decoder(self.headers.get("content-encoding", ""))
+        self._complete = False
+        self._closed = False
+        self._on_close = None
+        client._record(0, 0, request=True)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def iter_chunks(self, size: int = 16 * 1024):
+        while not self._closed:
+            data = self._raw.read(size)
+            if not data:
+                tail = self._decoder.flush()
+                self._client._record(0, len(tail))
+                self._complete = True
+                if tail:
+                    yield tail
+                return
+            decoded = self._decoder.feed(data)
+            self._client._record(len(data), len(decoded))
+            if decoded:
+                yield decoded
+
+    def read(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if not self._complete and not self._raw.will_close:
+            self._drain()
+        reusable = self._complete and not self._raw.will_close
+        if reusable:
+            self._client._release(self._key, self._conn)
+        else:
+            self._conn.close()
+        if self._on_close:
+            self._on_close()
+
+    def _drain(self) -> None:
+        # http.client sets length 0 for bodiless answers (304, 204); None means
+        # chunked or unknown, which could be arbitrarily long.
+        length = self._raw.length
+        if length is None or length > DRAIN_LIMIT:
+            return
+        try:
+            data = self._raw.read()
+        except Exception:
+            return
+        self._client._record(len(data), 0)
+        self._complete = True
+
+    def __enter__(self) -> "HttpStream":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _Decoder:
+    def __init__(self, encoding: str) -> None:
+        self.encoding = encoding.strip().lower()
+        self._obj = None
+        if self.encoding in {"gzip", "x-gzip"}:
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == "br" and brotli:
+            self._obj = brotli.Decompressor()
+
+    def feed(self, data: bytes) -> bytes:
+        if self.encoding == "deflate" and self._obj is None:
+            # Some servers send raw deflate without the zlib header.
+            wrapped = len(data) >= 2 and (data[0] & 0x0F) == 8 and ((data[0] << 8) | data[1]) % 31 == 0
+            self._obj = zlib.decompressobj() if wrapped else zlib.decompressobj(-zlib.MAX_WBITS)
+        if self._obj is None:
+            return data
+        if self.encoding == "br":
+            return self._obj.process(data)
+        return self._obj.decompress(data)
+
+    def flush(self) -> bytes:
+        if self._obj is None or self.encoding == "br":
+            return b""
+        return self._obj.flush()
+
+
+def _close_unused(future) -> None:
+    try:
+        if future.exception() is None:
+            future.result().close()
+    except Exception:
+        pass
+
+
+def _backoff(retry: int, retry_after: str | None = None) -> float:
+    try:
+        # Honour a short Retry-After; a long one is left to the circuit breaker.
+        if retry_after is not None and 0 <= float(retry_after) <= RETRY_BACKOFF_MAX:
+            return float(retry_after)
+    except Exception:
+        pass
+    return random.uniform(0, min(RETRY_BACKOFF * 2 ** retry, RETRY_BACKOFF_MAX))
+
+
+_client = HttpClient()
+_request_meter: contextvars.ContextVar = contextvars.ContextVar("prospector_request_meter", default=None)
+
+
+@contextmanager
+def count_requests():
+    """Count the requests sent inside the block, retries, redirects and hedges included."""
+    meter = [0]
+    token = _request_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _request_meter.reset(token)
+
+
+def configure_http(settings) -> HttpClient:
+    global _client
+    previous = _client
+    _client = HttpClient(
+        pool_size=getattr(settings, "http_pool_size", 4),
+        timeout=getattr(settings, "http_timeout", 20.0),
+        retries=getattr(settings, "http_retries", 2),
+        health=HostHealth(
+            failure_threshold=getattr(settings, "circuit_failure_threshold", 3),
+            open_seconds=getattr(settings, "circuit_open_seconds", 60.0),
+        ),
+        hedging=getattr(settings, "hedge_requests", False),
+    )
+    previous.close()
+    return _client
+
+
+def http_stats() -> dict:
+    return _client.stats()
+
+
+def http_get(url: str, headers: dict | None = None, timeout: float | None = None, hedge: bool = False) -> HttpResponse:
+    return _client.get(url, headers=headers, timeout=timeout, hedge=hedge)
+
+
+def http_stream(url: str, headers: dict | None = None, timeout: float | None = None, hedge: bool = False) -> HttpStream:
+    return _client.stream(url, headers=headers, timeout=timeout, hedge=hedge)
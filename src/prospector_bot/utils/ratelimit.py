@@ -0,0 +1,143 @@
+﻿"""Per-domain politeness limits shared by every agent."""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlparse
+import threading
+import time
+
+# rate (requests/second) / burst / max in-flight requests
+DEFAULT_DOMAIN_LIMITS = (
+    "craigslist.org=1/3/2,ebay.com=0.5/2/2,facebook.com=0.5/3/3,olx.com.br=0.5/2/2,"
+    "mercadolivre.com.br=1/3/2,mercadolibre.com=1/3/2,*=2/4/4"
+)
+
+
+@dataclass(frozen=True)
+class DomainLimit:
+    rate: float
+    burst: int
+    concurrency: int
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = max(float(rate), 0.0)
+        self.capacity = max(int(burst), 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.capacity)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.capacity)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class DomainRateLimiter:
+    """Token bucket plus in-flight cap per host; hosts match on domain suffix."""
+
+    def __init__(self, limits: dict[str, DomainLimit]) -> None:
+        self.limits = dict(limits)
+        self.default = self.limits.pop("*", DomainLimit(2.0, 4, 4))
+        self._buckets: dict[str, TokenBucket] = {}
+        self._slots: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str):
+        domain = self._domain_for(url)
+        bucket, semaphore = self._state_for(domain)
+        semaphore.acquire()
+        try:
+            bucket.acquire()
+            yield
+        finally:
+            semaphore.release()
+
+    def try_slot(self, url: str):
+        """Take a slot only if one is free right now; returns its release callable or None."""
+        bucket, semaphore = self._state_for(self._domain_for(url))
+        if not semaphore.acquire(blocking=False):
+            return None
+        if not bucket.try_acquire():
+            semaphore.release()
+            return None
+        return semaphore.release
+
+    def _domain_for(self, url: str) -> str:
+        try:
+            host = (urlparse(url).hostname or "").lower()
+        except Exception:
+            host = ""
+        for domain in self.limits:
+            if host == domain or host.endswith("." + domain):
+                return domain
+        return host or "*"
+
+    def _state_for(self, domain: str) -> tuple[TokenBucket, threading.BoundedSemaphore]:
+        with self._lock:
+            if domain not in self._buckets:
+                limit = self.limits.get(domain, self.default)
+                self._buckets[domain] = TokenBucket(limit.rate, limit.burst)
+                self._slots[domain] = threading.BoundedSemaphore(max(limit.concurrency, 1))
+            return self._buckets[domain], self._slots[domain]
+
+
+def parse_domain_limits(value: str | None) -> dict[str, DomainLimit]:
+    """Parse ``domain=rate/burst/concurrency`` pairs; ``*`` sets the fallback."""
+    limits = {}
+    for pair in (value or "").split(","):
+        if "=" not in pair:
+            continue
+        domain, raw = pair.split("=", 1)
+        parts = raw.strip().split("/")
+        try:
+            rate = float(parts[0])
+            burst = int(parts[1]) if len(parts) > 1 and parts[1] else 1
+            concurrency = int(parts[2]) if len(parts) > 2 and parts[2] else 1
+        except Exception:
+            continue
+        limits[domain.strip().lower()] = DomainLimit(rate, burst, concurrency)
+    return limits
+
+
+_limiter = DomainRateLimiter(parse_domain_limits(DEFAULT_DOMAIN_LIMITS))
+
+
+def configure_rate_limits(value: str | None) -> DomainRateLimiter:
+    global _limiter
+    limits = parse_domain_limits(DEFAULT_DOMAIN_LIMITS)
+    limits.update(parse_domain_limits(value))
+    _limiter = DomainRateLimiter(limits)
+    return _limiter
+
+
+def domain_slot(url: str):
+    return _limiter.slot(url)
+
+
+def try_domain_slot(url: str):
+    return _limiter.try_slot(url)
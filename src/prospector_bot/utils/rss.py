@@ -1,49 +1,194 @@
 ﻿"""Lightweight RSS helpers."""
 from __future__ import annotations
 
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterator
+import hashlib
 import html
 import re
-import urllib.request
+import threading
 import xml.etree.ElementTree as ET
 
+from .cache import cached
+from .coalesce import coalesced
+from .http_client import http_stream
 
-def fetch_rss_items(url: str, timeout: int = 20, user_agent: str | None = None) -> list[dict]:
+
+def fetch_rss_items(url: str, timeout: float | None = None, user_agent: str | None = None) -> list[dict]:
     if not url:
         return []
+    # Clients watching the same feed share one download per cycle, and a recent
+    # download across cycles. The returned list is shared and must be read-only.
+    return coalesced(
+        ("rss", url),
+        lambda: cached("rss", url, lambda: _download_feed(url, timeout=timeout, user_agent=user_agent)),
+    )
 
-    headers = {"User-Agent": user_agent or "ProspectorBot/1.0"}
-    request = urllib.request.Request(url, headers=headers)
+
+def iter_rss_items(
+    url: str,
+    timeout: float | None = None,
+    user_agent: str | None = None,
+    limit: int | None = None,
+    stop_when: Callable[[dict], bool] | None = None,
+) -> Iterator[dict]:
+    """Yield feed items one at a time while the response is still streaming.
+
+    Iteration ends after ``limit`` items or at the first item for which
+    ``stop_when`` returns true (e.g. a guid already in ``seen_ids``); the rest
+    of the feed is never downloaded or parsed. Finished items are not kept, so
+    memory stays flat however long the feed is; for the same reason a streamed
+    read never updates the feed cache used by ``fetch_rss_items``.
+    """
+    if not url:
+        return
+
+    previous = _feed_cache.get(url)
     try:
-        with urllib.request.urlopen(request, timeout=timeout) as response:
-            raw = response.read()
+        with http_stream(url, headers=_request_headers(previous, user_agent), timeout=timeout, hedge=True) as response:
+            if response.status == 304 and previous:
+                items = iter(previous.items)
+            elif response.ok:
+                items = _parse_chunks(response.iter_chunks())
+            else:
+                return
+
+            for count, item in enumerate(items):
+                if limit is not None and count >= limit:
+                    return
+                if stop_when is not None and stop_when(item):
+                    return
+                yield item
     except Exception:
-        return []
+        return
 
+
+def _download_feed(url: str, timeout: float | None = None, user_agent: str | None = None) -> list[dict]:
+    # The whole body is hashed before parsing, so an unchanged feed of any size
+    # without validators is answered from the previous parse.
+    previous = _feed_cache.get(url)
     try:
-        root = ET.fromstring(raw)
+        with http_stream(url, headers=_request_headers(previous, user_agent), timeout=timeout, hedge=True) as response:
+            if response.status == 304 and previous:
+                return previous.items
+            if not response.ok:
+                return []
+            body = b"".join(response.iter_chunks())
+            digest = hashlib.sha1(body).hexdigest()
+            if previous and previous.digest == digest:
+                _remember(url, response, digest, previous.items)
+                return previous.items
+            items = list(_parse_chunks([body]))
+            _remember(url, response, digest, items)
+            return items
     except Exception:
         return []
 
-    items = []
-    for item in root.findall(".//item"):
-        title = _safe_text(item, "title")
-        link = _safe_text(item, "link")
-        guid = _safe_text(item, "guid")
-        description = _strip_html(_safe_text(item, "description"))
-        pub_date = _safe_text(item, "pubDate") or _safe_text(
-            item, "{http://purl.org/dc/elements/1.1/}date"
-        )
-        items.append(
-            {
-                "title": title,
-                "link": link,
-                "guid": guid,
-                "description": description,
-                "pub_date": pub_date,
-            }
-        )
-
-    return items
+
+def _request_headers(previous: _FeedState | None, user_agent: str | None) -> dict:
+    headers = {"User-Agent": user_agent or "ProspectorBot/1.0"}
+    if previous:
+        if previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+    return headers
+
+
+def _parse_chunks(chunks) -> Iterator[dict]:
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: list[ET.Element] = []
+    for chunk in chunks:
+        try:
+            parser.feed(chunk)
+        except ET.ParseError:
+            return
+        yield from _drain(parser, stack)
+
+    try:
+        parser.close()
+    except ET.ParseError:
+        return
+    yield from _drain(parser, stack)
+
+
+def _drain(parser: ET.XMLPullParser, stack: list[ET.Element]) -> Iterator[dict]:
+    for event, element in parser.read_events():
+        if event == "start":
+            stack.append(element)
+            continue
+        stack.pop()
+        if element.tag != "item" and not element.tag.endswith("}item"):
+            continue
+        yield _item_from_element(element)
+        # Detach the finished item so the parsed tree does not grow with the feed.
+        if stack:
+            stack[-1].remove(element)
+        element.clear()
+
+
+def _item_from_element(item: ET.Element) -> dict:
+    title = _safe_text(item, "title")
+    link = _safe_text(item, "link")
+    guid = _safe_text(item, "guid")
+    description = _strip_html(_safe_text(item, "description"))
+    pub_date = _safe_text(item, "pubDate") or _safe_text(
+        item, "{http://purl.org/dc/elements/1.1/}date"
+    )
+    return {
+        "title": title,
+        "link": link,
+        "guid": guid,
+        "description": description,
+        "pub_date": pub_date,
+    }
+
+
+def _remember(url: str, response, digest: str, items: list[dict]) -> None:
+    _feed_cache.put(
+        url,
+        _FeedState(
+            etag=response.headers.get("etag", ""),
+            last_modified=response.headers.get("last-modified", ""),
+            digest=digest,
+            items=items,
+        ),
+    )
+
+
+@dataclass
+class _FeedState:
+    etag: str
+    last_modified: str
+    digest: str
+    items: list[dict]
+
+
+class _FeedCache:
+    """Validators, body hash and parsed items of the most recently polled feeds."""
+
+    def __init__(self, max_feeds: int) -> None:
+        self.max_feeds = max_feeds
+        self._states: OrderedDict[str, _FeedState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> _FeedState | None:
+        with self._lock:
+            state = self._states.get(url)
+            if state is not None:
+                self._states.move_to_end(url)
+            return state
+
+    def put(self, url: str, state: _FeedState) -> None:
+        with self._lock:
+            self._states[url] = state
+            self._states.move_to_end(url)
+            while len(self._states) > self.max_feeds:
+                self._states.popitem(last=False)
+
+
+_feed_cache = _FeedCache(max_feeds=512)
 
 
 def _safe_text(node: ET.Element, tag: str) -> str: